@@ -1,103 +1,150 @@
-from flask import Flask, jsonify, request, send_from_directory
-from datetime import datetime, timedelta
-from db_manager import db, Topic
-from sutils import epoch_to_relative_time
+from flask import Flask, Response, jsonify, request, send_from_directory
+from db_manager import TOPIC_SORTS, homepage_topics, init_db, prepare_database, query_topics, read_snapshot, search_topics
+import json
 import os
+import smetrics
 import srender
-
-SITES_TO_SCRAPE = {
-    'onche': {
-        'url': 'https://onche.org/forum/1/blabla-general',
-        'parser': 'parse_onche'
-    },
-    'avenoel': {
-        'url': 'https://avenoel.org/forum',
-        'parser': 'parse_avenoel'
-    },
-    'village': {
-        'url': 'https://village.cx/village',
-        'parser': 'parse_village'
-    },
-    'jeuxvideo': {
-        'url': 'https://www.jeuxvideo.com/forums/0-51-0-1-0-1-0-blabla-18-25-ans.htm',
-        'parser': 'parse_jeuxvideo'
-    },
-    '2sucres': {
-        'url': 'https://2sucres.org/forums/1/1',
-        'parser': 'parse_2sucres'
-    }
-}
+import sstream
+from sites import SITES_TO_SCRAPE
+from sutils import setup_logging
 
 def get_all_scraped(raw=False):
     """
-    Return at least 5 topics per forum/website, then fill the rest with the most replied topics.
-    If `raw` is True, return the raw list of topics instead of a JSON response.
+    Return at least 5 topics per forum/website, then fill the rest with the topics that gained
+    the most replies over the last 2 hours, then with the most replied topics on quiet days.
+    If `raw` is True, return the rows themselves instead of a JSON response.
     """
-    # Fetch all unique site keys
-    site_keys = db.session.query(Topic.site_key).distinct().all()
-    site_keys = [key[0] for key in site_keys]
-
-    # Collect at least 5 topics per site
-    topics = []
-    for site_key in site_keys:
-        site_topics = Topic.query.filter_by(site_key=site_key).order_by(Topic.timestamp.desc()).limit(5).all()
-        topics.extend(site_topics)
-
-    # Fill the remaining slots with the most replied topics
-    remaining_slots = 60 - len(topics)
-    if remaining_slots > 0:
-        most_replied_topics = Topic.query.order_by(Topic.replies.desc()).limit(remaining_slots).all()
-        topics.extend(most_replied_topics)
-
-    # Remove duplicates (in case a topic is already included in the first step)
-    unique_topics = {topic.id: topic for topic in topics}.values()
-
-    # Format the result
-    result = [
-        {
-            'site_key': topic.site_key,
-            'title': topic.title,
-            'topic_url': topic.topic_url,
-            'username': topic.username,
-            'replies': topic.replies,
-            'last_activity': topic.last_activity,
-            'timestamp': topic.timestamp
-        }
-        for topic in unique_topics
-    ]
-    
-    # Sort the result by last_activity (converting time strings to seconds for comparison)
-    result.sort(key=lambda x: x['last_activity'], reverse=True)
-
-    # Convert last_activity to relative time
-    for topic in result:
-        topic['last_activity'] = epoch_to_relative_time(int(topic['last_activity']))
+    topics = homepage_topics()
 
     if raw:
-        return result  # Return raw data
-    return jsonify(result)  # Return JSON response
+        return topics  # Return raw rows
+    return jsonify([dict(topic._mapping) for topic in topics])  # Return JSON response
+
+# Page size bounds of the JSON API
+API_DEFAULT_LIMIT = 50
+API_MAX_LIMIT = 200
+
+def int_arg(name, default=None):
+    """
+    Integer request argument `name`, or `default` when absent.
+    Raises ValueError when it is given but not an integer.
+    """
+    value = request.args.get(name)
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer") from None
+
+def api_topics_response(site_key=None):
+    """
+    Build a page of the /api/topics listing from the request arguments:
+    site_key, since (epoch), min_replies, sort, order, limit and cursor.
+    """
+    site_key = site_key or request.args.get('site_key')
+    if site_key is not None and site_key not in SITES_TO_SCRAPE:
+        return jsonify({'error': f"Unknown site_key: {site_key}"}), 404
+
+    sort = request.args.get('sort', 'last_activity')
+    order = request.args.get('order', 'desc')
+    if sort not in TOPIC_SORTS:
+        return jsonify({'error': f"sort must be one of {', '.join(TOPIC_SORTS)}"}), 400
+    if order not in ('asc', 'desc'):
+        return jsonify({'error': "order must be 'asc' or 'desc'"}), 400
+
+    try:
+        since = int_arg('since')
+        min_replies = int_arg('min_replies')
+        limit = min(max(int_arg('limit', API_DEFAULT_LIMIT), 1), API_MAX_LIMIT)
+        topics, next_cursor = query_topics(
+            site_key=site_key, since=since, min_replies=min_replies, sort=sort, order=order,
+            limit=limit, cursor=request.args.get('cursor')
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({
+        'topics': [
+            {
+                'site_key': topic.site_key,
+                'title': topic.title,
+                'topic_url': topic.topic_url,
+                'username': topic.username,
+                'replies': topic.replies,
+                'last_activity': topic.last_activity,
+                'timestamp': topic.timestamp.isoformat() if topic.timestamp else None
+            }
+            for topic in topics
+        ],
+        'next_cursor': next_cursor
+    })
+
+# /search page size, and the longest query accepted
+SEARCH_LIMIT = 50
+SEARCH_MAX_LENGTH = 100
 
 def create_app():
+    setup_logging()
     app = Flask(__name__)
 
-    # Configure the database
-    db_folder = os.path.join(os.path.dirname(__file__), 'db')
-    os.makedirs(db_folder, exist_ok=True)
-    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{os.path.join(db_folder, "scraped_data.db")}'
-    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-    
+    # The schema is brought up to date first, the app itself only ever reads
+    prepare_database()
+
     # Initialize extensions
-    db.init_app(app)
+    init_db(app, read_only=True)
     srender.init_app(app)
-
-    # Create the database tables
-    with app.app_context():
-        db.create_all()
+    sstream.init_app(app)
 
     @app.route('/')
     def home():
-        topics = get_all_scraped(raw=True)
-        return srender.render_topic(topics)
+        snapshot = read_snapshot(decode=False)
+        if snapshot is None:
+            # Nothing published yet (first scrape cycle still running), render uncached
+            return srender.render_topic(get_all_scraped(raw=True))
+
+        # The cache key and the topics come from the same read: a publish in between
+        # must not put the new topics in the page cached under the old version
+        version, created_at, topics = snapshot
+        return srender.render_home(version, created_at, lambda: json.loads(topics))
+
+    @app.route('/api/topics')
+    def api_topics():
+        return api_topics_response()
+
+    @app.route('/api/topics/<site_key>')
+    def api_site_topics(site_key):
+        return api_topics_response(site_key)
+
+    @app.route('/stream')
+    def stream():
+        if not sstream.acquire_slot():
+            # Every stream slot is taken; refuse before pinning a thread that pages need
+            return Response(f"retry: {sstream.BUSY_RETRY * 1000}\n\n", status=503, mimetype='text/event-stream',
+                            headers={'Retry-After': str(sstream.BUSY_RETRY), 'Cache-Control': 'no-store'})
+        last_event_id = request.headers.get('Last-Event-ID', type=int)
+        response = Response(sstream.stream(last_event_id), mimetype='text/event-stream',
+                            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+        # Runs when the server closes the response, even if the stream never started
+        response.call_on_close(sstream.release_slot)
+        return response
+
+    @app.route('/search')
+    def search():
+        query = request.args.get('q', '').strip()[:SEARCH_MAX_LENGTH]
+        topics = search_topics(query, limit=SEARCH_LIMIT) if query else []
+        return srender.render_search(query, topics)
+
+    @app.route('/metrics')
+    def metrics():
+        # The scraper runs in its own process; its latest dump is served alongside
+        body = smetrics.web_registry.render() + smetrics.read_scraper_metrics()
+        return Response(body, content_type=smetrics.CONTENT_TYPE, headers={'Cache-Control': 'no-store'})
+
+    @app.after_request
+    def count_request(response):
+        smetrics.http_requests.inc(endpoint=request.endpoint or 'none', status=response.status_code)
+        return response
 
     @app.route('/about')
     def about():
@@ -0,0 +1,51 @@
+"""
+Micro-benchmark of the timestamp normalization: the legacy per-row helpers
+(convert_to_epoch, relative_time_to_epoch) against TimestampNormalizer.batch.
+
+    python benchmarks/bench_timestamps.py [--rows 1000] [--repeat 20]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sutils import TimestampNormalizer, convert_to_epoch, relative_time_to_epoch
+
+# One sample of every format the forums produce
+ABSOLUTE_SAMPLES = ["2025-04-16T14:20:07.505Z", "4/15/2025", "17/04 11:20:22", "5:44:28 PM", "16:35:58", "9:43:19"]
+RELATIVE_SAMPLES = ["43s", "5m", "2h", "2j"]
+
+
+def timestamp_cases(rows):
+    """The four conversions of `rows` timestamps, as name -> callable"""
+    absolute = (ABSOLUTE_SAMPLES * (rows // len(ABSOLUTE_SAMPLES) + 1))[:rows]
+    relative = (RELATIVE_SAMPLES * (rows // len(RELATIVE_SAMPLES) + 1))[:rows]
+
+    return {
+        'absolute_legacy': lambda: [convert_to_epoch(raw) for raw in absolute],
+        'absolute_batch': lambda: TimestampNormalizer().batch(absolute, 'absolute'),
+        'relative_legacy': lambda: [relative_time_to_epoch(raw) for raw in relative],
+        'relative_batch': lambda: TimestampNormalizer().batch(relative, 'relative'),
+    }
+
+
+def run(rows, repeat):
+    results = {}
+    for name, case in timestamp_cases(rows).items():
+        best = min(timeit.repeat(case, number=1, repeat=repeat))
+        results[name] = best
+        print(f"{name:16} {best * 1000:8.2f} ms per {rows} rows ({best / rows * 1e6:.2f} us/row)")
+
+    for kind in ('absolute', 'relative'):
+        print(f"{kind} speedup: {results[kind + '_legacy'] / results[kind + '_batch']:.1f}x")
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+    run(args.rows, args.repeat)
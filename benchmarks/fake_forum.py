@@ -0,0 +1,175 @@
+"""
+Local stand-in for the scraped forums, to load-test the whole scrape pipeline
+without touching the real sites. Serves listing pages in the markup of every
+site of sites.py (see benchmarks/markup.py) that change over time: new topics
+arrive and existing ones get replies and move up, at configurable rates, with
+configurable latency, error rate and page size.
+
+    python benchmarks/fake_forum.py --port 8800 --new-topics 2 --replies 10 --latency 0.2 --error-rate 0.05
+
+then point the scraper at it (SITES_TO_SCRAPE is rewritten at import time):
+
+    FOROUM_SITES_BASE_URL=http://127.0.0.1:8800 FOROUM_SITES_FETCH=http python run_scraper.py
+
+Pages are served at /<site_key>/<page>; /stats returns request counters as JSON.
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from markup import PAGE_SIZES, render_page, synthetic_topics
+
+# Topics on the forum when the server starts, per site
+INITIAL_TOPICS = 500
+
+
+class FakeForum:
+    """
+    The topics of one site and their evolution. Activity is applied lazily, on
+    each request, for the time elapsed since the previous one, so the forum
+    changes at the configured rates whatever the request pattern.
+    """
+
+    def __init__(self, site_key, seed, page_size, new_topics_per_second, replies_per_second):
+        self.site_key = site_key
+        self.page_size = page_size
+        self.new_topics_per_second = new_topics_per_second
+        self.replies_per_second = replies_per_second
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+
+        now = time.time()
+        self.topics = synthetic_topics(INITIAL_TOPICS, seed=seed)
+        for topic in self.topics:
+            topic['last_post'] = now - topic.pop('age')
+        self.next_id = INITIAL_TOPICS + 1
+        self.updated_at = now
+
+    def advance(self, now):
+        elapsed = now - self.updated_at
+        self.updated_at = now
+        for _ in range(self._events(self.new_topics_per_second * elapsed)):
+            topic = synthetic_topics(1, seed=self.rng.random(), start_id=self.next_id)[0]
+            topic.pop('age')
+            topic.update(replies=0, last_post=now)
+            self.topics.append(topic)
+            self.next_id += 1
+        for _ in range(self._events(self.replies_per_second * elapsed)):
+            # Recent topics are the likeliest to get an answer
+            topic = self.topics[(int(self.rng.paretovariate(1.2)) - 1) % len(self.topics)]
+            topic['replies'] += 1
+            topic['last_post'] = now
+        self.topics.sort(key=lambda topic: topic['last_post'], reverse=True)
+
+    def _events(self, expected):
+        """Number of events in a period: the integer part, plus one more by chance"""
+        count = int(expected)
+        return count + (1 if self.rng.random() < expected - count else 0)
+
+    def page(self, number, base_url):
+        with self.lock:
+            now = time.time()
+            self.advance(now)
+            start = (number - 1) * self.page_size
+            topics = [
+                dict(topic, age=max(int(now - topic['last_post']), 0))
+                for topic in self.topics[start:start + self.page_size]
+            ]
+        return render_page(self.site_key, topics, base_url=base_url)
+
+
+class FakeForumServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, forums, latency, jitter, error_rate):
+        super().__init__(address, FakeForumHandler)
+        self.forums = forums
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.stats = {site_key: {'requests': 0, 'errors': 0, 'not_modified': 0} for site_key in forums}
+        self.stats_lock = threading.Lock()
+
+    def count(self, site_key, stat):
+        with self.stats_lock:
+            self.stats[site_key][stat] += 1
+
+
+class FakeForumHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        parts = self.path.split('?')[0].strip('/').split('/')
+        if parts == ['stats']:
+            with self.server.stats_lock:
+                return self._send(200, json.dumps(self.server.stats).encode(), 'application/json')
+        if len(parts) != 2 or parts[0] not in self.server.forums or not parts[1].isdigit() or int(parts[1]) < 1:
+            return self._send(404, b'Not found', 'text/plain')
+
+        site_key = parts[0]
+        self.server.count(site_key, 'requests')
+        delay = self.server.latency + random.uniform(-self.server.jitter, self.server.jitter)
+        if delay > 0:
+            time.sleep(delay)
+        if random.random() < self.server.error_rate:
+            self.server.count(site_key, 'errors')
+            return self._send(503, b'Service unavailable', 'text/plain', {'Retry-After': '5'})
+
+        host = self.headers.get('Host', f'127.0.0.1:{self.server.server_address[1]}')
+        body = self.server.forums[site_key].page(int(parts[1]), f'http://{host}/{site_key}').encode('utf-8')
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        if self.headers.get('If-None-Match') == etag:
+            self.server.count(site_key, 'not_modified')
+            return self._send(304, b'', None, {'ETag': etag})
+        self._send(200, body, 'text/html; charset=utf-8', {'ETag': etag})
+
+    def _send(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        if content_type:
+            self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8800)
+    parser.add_argument('--new-topics', type=float, default=0.05, help='new topics per second, per site')
+    parser.add_argument('--replies', type=float, default=1.0, help='replies per second, per site')
+    parser.add_argument('--latency', type=float, default=0.1, help='mean response delay in seconds')
+    parser.add_argument('--jitter', type=float, default=0.05, help='response delay varies by up to this much')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of requests answered with a 503')
+    parser.add_argument('--page-size', type=int, help='topics per page, instead of each forum\'s own')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    forums = {
+        site_key: FakeForum(site_key, args.seed + index, args.page_size or size, args.new_topics, args.replies)
+        for index, (site_key, size) in enumerate(PAGE_SIZES.items())
+    }
+    server = FakeForumServer((args.host, args.port), forums, args.latency, args.jitter, args.error_rate)
+    print(f"Fake forums on http://{args.host}:{args.port}/<site>/<page> for: {', '.join(forums)}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
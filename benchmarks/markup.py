@@ -0,0 +1,171 @@
+"""
+Synthetic forum pages matching the selectors of every site in sites.py, for the
+benchmarks and the local fake forum. The markup is written from the selectors,
+not captured from the live forums: it carries the elements and classes the
+parsers read, not the rest of the real pages.
+
+    python benchmarks/markup.py            # rewrite benchmarks/fixtures/*.html
+"""
+from datetime import datetime, timezone
+from html import escape
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sutils import PARIS
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# Topics per listing page, as on the real forums
+PAGE_SIZES = {'onche': 50, 'avenoel': 50, 'village': 40, 'jeuxvideo': 25, '2sucres': 30}
+
+_WORDS = (
+    "élection", "forêt", "été", "café", "déjà", "opinion", "sondage", "pourquoi", "vous", "les",
+    "khey", "topic", "officiel", "série", "jeu", "vidéo", "question", "aide", "conseil", "année",
+    "travail", "appartement", "voiture", "cuisine", "football", "musique", "film", "débat", "crise", "école"
+)
+_NAMES = ("Kheyou", "Célestin", "PapyGeek", "Zoé_75", "LeRoiDuForum", "Anonyme", "Hélène", "MrQuestion")
+
+
+def synthetic_topics(count, seed=0, start_id=1):
+    """
+    `count` reproducible topics: dicts with id, title, username, replies and age
+    (seconds since the last message), most recently active first.
+    """
+    rng = random.Random(seed)
+    topics = []
+    age = 0
+    for topic_id in range(start_id, start_id + count):
+        age += rng.randint(5, 240)
+        topics.append({
+            'id': topic_id,
+            'title': ' '.join(rng.choice(_WORDS) for _ in range(rng.randint(3, 9))).capitalize(),
+            'username': rng.choice(_NAMES) + str(rng.randint(1, 999)),
+            'replies': rng.randint(0, 2000),
+            'age': age
+        })
+    return topics
+
+
+def _relative(age, spaced=False):
+    for unit, seconds in (('j', 86400), ('h', 3600), ('m', 60)):
+        if age >= seconds:
+            value = age // seconds
+            break
+    else:
+        unit, value = 's', age
+    return f"{value} {unit}" if spaced else f"{value}{unit}"
+
+
+def _absolute(age, now):
+    moment = datetime.fromtimestamp(now.timestamp() - age, PARIS)
+    if moment.date() == now.date():
+        return moment.strftime('%H:%M:%S')
+    return moment.strftime('%d/%m %H:%M:%S')
+
+
+def _slug(title):
+    return '-'.join(title.lower().split())[:60]
+
+
+def _onche(topic, now, base):
+    url = escape(f"{base}/topic/{topic['id']}/{_slug(topic['title'])}")
+    return (
+        f'<div class="topic"><a class="topic-subject link" href="{url}"><span>{escape(topic["title"])}</span></a>'
+        f'<div class="topic-username">{escape(topic["username"])}</div>'
+        f'<span class="topic-nb">{topic["replies"]}</span>'
+        f'<a class="right" href="{url}#last"><span>{_relative(topic["age"])}</span></a></div>'
+    )
+
+
+def _avenoel(topic, now, base):
+    url = escape(f"{base}/topic/{topic['id']}-1-{_slug(topic['title'])}")
+    pages = topic['replies'] // 20 + 1
+    return (
+        f'<tr><td class="topics-title"><a href="{url}">{escape(topic["title"])} ({pages})</a></td>'
+        f'<td class="topics-author"><a href="{base}/profil/{escape(topic["username"])}">{escape(topic["username"])}</a></td>'
+        f'<td class="topics-amount">{topic["replies"]}</td>'
+        f'<td class="topics-date">{_absolute(topic["age"], now)}</td></tr>'
+    )
+
+
+def _village(topic, now, base):
+    return (
+        f'<div class="row-center bg-base-0"><a href="/village/{topic["id"]}-{escape(_slug(topic["title"]))}" class="row-center">'
+        f'<div><span class="font-medium"><span class="topic-title">{escape(topic["title"])}</span> '
+        f'<span class="text-sm"><i class="far fa-message-lines"></i> {topic["replies"]}</span></span></div>'
+        f'<span class="row-center text-sm"><span>{escape(topic["username"])}</span></span>'
+        f'<span class="ml-auto mr-2">{_relative(topic["age"], spaced=True)}</span></a></div>'
+    )
+
+
+def _jeuxvideo(topic, now, base):
+    return (
+        f'<li data-id="{topic["id"]}"><span class="topic-subject">'
+        f'<a class="topic-title" href="/forums/42-51-{topic["id"]}-1-0-1-0-{escape(_slug(topic["title"]))}.htm">{escape(topic["title"])}</a></span>'
+        f'<a class="topic-author" href="/profil/{escape(topic["username"].lower())}">{escape(topic["username"])}</a>'
+        f'<span class="topic-count">{topic["replies"]}</span>'
+        f'<span class="topic-date"><a href="/forums/42-51-{topic["id"]}-last.htm">{_absolute(topic["age"], now)}</a></span></li>'
+    )
+
+
+def _2sucres(topic, now, base):
+    return (
+        f'<div class="tr"><div class="topicName"><a href="/topic/{topic["id"]}/{escape(_slug(topic["title"]))}">{escape(topic["title"])}</a></div>'
+        f'<div class="topicAuteur"><a href="/profil/{escape(topic["username"])}">{escape(topic["username"])}</a></div>'
+        f'<div class="topicNb">{topic["replies"]}</div>'
+        f'<div class="topicDernier"><a href="/topic/{topic["id"]}/last">{_absolute(topic["age"], now)}</a></div></div>'
+    )
+
+
+# Row markup and the container wrapping the rows, per site
+_LAYOUTS = {
+    'onche': (_onche, '<div class="topics">{rows}</div>'),
+    'avenoel': (_avenoel, '<table class="topics"><tr><th>Sujet</th><th>Auteur</th><th>Nb</th><th>Dernier msg</th></tr>{rows}</table>'),
+    'village': (_village, '<div class="topics">{rows}</div>'),
+    'jeuxvideo': (_jeuxvideo, '<ul class="topic-list"><li class="topic-head"><span>Sujet</span></li>{rows}</ul>'),
+    '2sucres': (_2sucres, '<div class="table"><div class="thead"><div class="tr">Sujet</div></div><div class="tbody"><div>{rows}</div></div></div>'),
+}
+
+# Where absolute topic links point for sites whose hrefs are absolute
+_DEFAULT_BASES = {'onche': 'https://onche.org', 'avenoel': 'https://avenoel.org'}
+
+
+def render_page(site_key, topics, now=None, base_url=None):
+    """
+    HTML of a listing page of site_key showing `topics` (see synthetic_topics).
+    `base_url` replaces the forum's own host in absolute topic links.
+    """
+    row, container = _LAYOUTS[site_key]
+    now = (now or datetime.now(timezone.utc)).astimezone(PARIS)
+    base = (base_url or _DEFAULT_BASES.get(site_key, '')).rstrip('/')
+    rows = ''.join(row(topic, now, base) for topic in topics)
+    return (
+        f'<!DOCTYPE html><html lang="fr"><head><meta charset="utf-8"><title>{site_key}</title></head>'
+        f'<body><header><nav><a href="/">{site_key}</a></nav></header><main>{container.format(rows=rows)}</main>'
+        f'<footer>Page générée pour les benchmarks</footer></body></html>'
+    )
+
+
+def fixture_path(site_key):
+    return os.path.join(FIXTURES_DIR, f'{site_key}.html')
+
+
+def load_fixture(site_key):
+    with open(fixture_path(site_key), encoding='utf-8') as f:
+        return f.read()
+
+
+def write_fixtures():
+    """(Re)generate one listing page per site under benchmarks/fixtures/"""
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    for seed, (site_key, size) in enumerate(PAGE_SIZES.items()):
+        with open(fixture_path(site_key), 'w', encoding='utf-8') as f:
+            f.write(render_page(site_key, synthetic_topics(size, seed=seed)) + '\n')
+        print(f"Wrote {fixture_path(site_key)}")
+
+
+if __name__ == '__main__':
+    write_fixtures()
@@ -0,0 +1,229 @@
+"""
+Offline benchmark suite: no forum is contacted and no browser is launched.
+Times the site parsers on the fixtures of benchmarks/fixtures/ (for every HTML
+backend installed), the timestamp conversions, the scraper's database save path
+and the homepage query and render at several table sizes, against throwaway
+SQLite databases. Results are printed as JSON, to compare runs.
+
+    python benchmarks/run_benchmarks.py [--sizes 10000,100000,1000000] [--repeat 5] [--output results.json]
+"""
+from datetime import datetime, timedelta, timezone
+import argparse
+import importlib
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask
+from sqlalchemy import insert
+
+from bench_timestamps import timestamp_cases
+from db_manager import Topic, TopicHistory, db, init_db, prepare_database
+from markup import PAGE_SIZES, load_fixture, synthetic_topics
+from sites import SITES_TO_SCRAPE
+import forums.backend
+from forums.registry import get_parser
+import srender
+
+BACKENDS = ('selectolax', 'lxml', 'bs4')
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+
+# Rows inserted per statement when filling a table for the homepage benchmark
+FILL_CHUNK = 50_000
+
+
+def measure(function, repeat):
+    """Run function `repeat` times; return its best and median wall time in seconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return {'best': min(timings), 'median': statistics.median(timings), 'runs': repeat}
+
+
+def installed_backends():
+    modules = {'selectolax': 'selectolax.lexbor', 'lxml': 'lxml.cssselect', 'bs4': 'bs4'}
+    available = []
+    for backend in BACKENDS:
+        try:
+            importlib.import_module(modules[backend])
+            available.append(backend)
+        except ImportError:
+            pass
+    return available
+
+
+def bench_parsers(repeat):
+    """Seconds per fixture page, per site and HTML backend"""
+    results = {}
+    configured = forums.backend.BACKEND
+    try:
+        for backend in installed_backends():
+            forums.backend.BACKEND = backend
+            for site_key in SITES_TO_SCRAPE:
+                html_content = load_fixture(site_key)
+                parse = get_parser(site_key)
+                timing = measure(lambda: parse(html_content), repeat)
+                timing['topics'] = len(parse(html_content).topics)
+                timing['bytes'] = len(html_content.encode('utf-8'))
+                results.setdefault(site_key, {})[backend] = timing
+    finally:
+        forums.backend.BACKEND = configured
+    return results
+
+
+def bench_timestamps(rows, repeat):
+    results = {name: measure(case, repeat) for name, case in timestamp_cases(rows).items()}
+    return {'rows': rows, 'cases': results}
+
+
+def make_app(path):
+    """A minimal app on a fresh database file, set up like the real ones"""
+    app = Flask('app', root_path=ROOT)
+    prepare_database(path)
+    init_db(app, path=path)
+    srender.init_app(app)
+    return app
+
+
+def bench_save(directory, repeat):
+    """
+    scraper.save_topics on the fixture pages: a batch of new topics, the same
+    batch again (nothing changed) and the batch with every reply count bumped.
+    """
+    from scraper import save_topics
+
+    app = make_app(os.path.join(directory, 'save.db'))
+    results = {}
+    with app.app_context():
+        for site_key in SITES_TO_SCRAPE:
+            topics = get_parser(site_key)(load_fixture(site_key)).topics
+            runs = iter(range(repeat * 2))
+
+            def fresh_batch():
+                # New URLs on every run, so each one really inserts
+                run = next(runs)
+                return [dict(topic, topic_url=f"{topic['topic_url']}?run={run}") for topic in topics]
+
+            inserted = measure(lambda: save_topics(site_key, fresh_batch()), repeat)
+            batch = fresh_batch()
+            save_topics(site_key, batch)
+            unchanged = measure(lambda: save_topics(site_key, batch), repeat)
+            bumps = iter(range(1, repeat + 1))
+
+            def bumped_batch():
+                # One bump per run, for every topic of the batch
+                bump = next(bumps)
+                return [dict(topic, replies=topic['replies'] + bump) for topic in batch]
+
+            updated = measure(lambda: save_topics(site_key, bumped_batch()), repeat)
+            results[site_key] = {'topics': len(topics), 'insert': inserted, 'unchanged': unchanged, 'update': updated}
+    return results
+
+
+def fill_topics(size, seed=0):
+    """Insert `size` topics spread over the sites, plus a reply history for the active ones"""
+    rng = random.Random(seed)
+    site_keys = list(SITES_TO_SCRAPE)
+    now = datetime.now(timezone.utc)
+    now_epoch = int(now.timestamp())
+    for start in range(0, size, FILL_CHUNK):
+        count = min(FILL_CHUNK, size - start)
+        topics = synthetic_topics(count, seed=seed + start, start_id=start + 1)
+        rows = []
+        for topic in topics:
+            age = topic['age'] * (start // FILL_CHUNK + 1)
+            rows.append({
+                'id': topic['id'],
+                'site_key': site_keys[topic['id'] % len(site_keys)],
+                'title': topic['title'],
+                'topic_url': f"https://forum.invalid/topic/{topic['id']}",
+                'username': topic['username'],
+                'replies': topic['replies'],
+                'last_activity': now_epoch - age,
+                'timestamp': now - timedelta(seconds=age)
+            })
+        db.session.execute(insert(Topic), rows)
+        history = [
+            {'topic_id': row['id'], 'cycle_ts': now_epoch - rng.randint(0, 3 * 3600), 'replies': max(row['replies'] - rng.randint(0, 50), 0)}
+            for row in rows if rng.random() < 0.02
+        ]
+        if history:
+            db.session.execute(insert(TopicHistory).prefix_with('OR IGNORE'), history)
+        db.session.commit()
+
+
+def bench_homepage(directory, sizes, repeat):
+    """Homepage query (app.get_all_scraped) and render (srender.render_topic) per table size"""
+    from app import get_all_scraped
+
+    results = {}
+    for size in sizes:
+        path = os.path.join(directory, f'homepage-{size}.db')
+        app = make_app(path)
+        with app.app_context():
+            start = time.perf_counter()
+            fill_topics(size)
+            fill_seconds = time.perf_counter() - start
+
+            rows = get_all_scraped(raw=True)
+            with app.test_request_context('/'):
+                results[str(size)] = {
+                    'fill_seconds': fill_seconds,
+                    'db_bytes': os.path.getsize(path),
+                    'homepage_rows': len(rows),
+                    'get_all_scraped': measure(lambda: get_all_scraped(raw=True), repeat),
+                    'render_topic': measure(lambda: srender.render_topic(rows), repeat)
+                }
+            db.session.remove()
+        os.remove(path)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help='comma separated topic table sizes for the homepage benchmark')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--timestamp-rows', type=int, default=1000)
+    parser.add_argument('--output', help='write the JSON here instead of stdout')
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+
+    with tempfile.TemporaryDirectory(prefix='foroum-bench-') as directory:
+        report = {
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'environment': {
+                'python': platform.python_version(),
+                'sqlite': sqlite3.sqlite_version,
+                'platform': platform.platform(),
+                'backends': installed_backends(),
+                'fixture_topics': PAGE_SIZES
+            },
+            'parse': bench_parsers(args.repeat),
+            'timestamps': bench_timestamps(args.timestamp_rows, args.repeat),
+            'save_topics': bench_save(directory, args.repeat),
+            'homepage': bench_homepage(directory, sizes, args.repeat)
+        }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
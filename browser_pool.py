@@ -0,0 +1,184 @@
+from contextlib import contextmanager
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+CHROME_BINARY = "/usr/bin/google-chrome"
+CHROMEDRIVER_PATH = "/usr/local/bin/chromedriver"
+CHROME_USER_DATA_DIR = "/root/.config/google-chrome"
+
+# A Chrome session is thrown away and relaunched after serving this many pages,
+# which keeps its memory usage from creeping up over days of scraping.
+MAX_PAGES_PER_SESSION = 500
+
+
+def _chrome_options(profile):
+    """
+    Build the Chrome options for a profile. The 'Default' profile keeps using the
+    historical user data dir (and its cookies); any other profile gets a data dir of
+    its own, since Chrome refuses to open the same data dir twice.
+    """
+    chrome_options = Options()
+    chrome_options.binary_location = CHROME_BINARY
+    #chrome_options.add_argument("--headless")
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-popup-blocking")
+    # driver.get() returns once the DOM is parsed instead of waiting for every image
+    # and ad; the scraper then waits for the topic list itself (scraper.wait_until_ready)
+    chrome_options.page_load_strategy = 'eager'
+    if profile == 'Default':
+        chrome_options.add_argument(f"--user-data-dir={CHROME_USER_DATA_DIR}")
+    else:
+        chrome_options.add_argument(f"--user-data-dir={CHROME_USER_DATA_DIR}-{profile}")
+    chrome_options.add_argument("--profile-directory=Default")
+    return chrome_options
+
+
+class BrowserSession:
+    """
+    One long-lived Chrome process, with one tab per site that uses it.
+    A WebDriver is not thread-safe, so the session is only ever used under its lock.
+    """
+
+    def __init__(self, profile):
+        self.profile = profile
+        self.lock = threading.Lock()
+        self.driver = None
+        self.tabs = {}
+        self.pages = 0
+
+    def launch(self):
+        service = Service(CHROMEDRIVER_PATH)
+        self.driver = webdriver.Chrome(service=service, options=_chrome_options(self.profile))
+        self.driver.execute_cdp_cmd('Page.setBypassCSP', {'enabled': True})
+        self.tabs = {}
+        self.pages = 0
+        logger.info("Launched browser session for profile: %s", self.profile)
+
+    def quit(self):
+        if self.driver is None:
+            return
+        try:
+            self.driver.quit()
+        except Exception as e:
+            logger.error("Failed to close browser for profile %s: %s", self.profile, e)
+        self.driver = None
+        self.tabs = {}
+
+    def is_healthy(self):
+        if self.driver is None:
+            return False
+        try:
+            self.driver.window_handles
+            return True
+        except WebDriverException:
+            return False
+
+    def switch_to_tab(self, site_key):
+        """Focus the tab reserved for site_key, opening it on first use"""
+        handles = self.driver.window_handles
+        handle = self.tabs.get(site_key)
+        if handle not in handles:
+            # The first site to use a fresh session takes over its initial tab
+            if not self.tabs and handles:
+                handle = handles[0]
+                self.driver.switch_to.window(handle)
+            else:
+                self.driver.switch_to.new_window('tab')
+                handle = self.driver.current_window_handle
+            self.tabs[site_key] = handle
+        else:
+            self.driver.switch_to.window(handle)
+
+
+class BrowserPool:
+    """
+    Keeps one Chrome session per profile alive across scrape cycles.
+    Sessions are health-checked before every use and recycled after
+    MAX_PAGES_PER_SESSION pages or when the browser crashes.
+    """
+
+    def __init__(self, max_pages=MAX_PAGES_PER_SESSION):
+        self.max_pages = max_pages
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._stats = {'launches': 0, 'recycles': 0, 'crashes': 0, 'pages': 0}
+
+    def _session(self, profile):
+        with self._lock:
+            if profile not in self._sessions:
+                self._sessions[profile] = BrowserSession(profile)
+            return self._sessions[profile]
+
+    def _count(self, stat):
+        with self._lock:
+            self._stats[stat] += 1
+
+    @contextmanager
+    def tab(self, profile, site_key):
+        """
+        Yield a driver focused on the tab of site_key, inside the session of profile.
+        Callers of the same profile are serialized; different profiles run in parallel.
+        """
+        session = self._session(profile)
+        with session.lock:
+            if not session.is_healthy():
+                if session.driver is not None:
+                    logger.error("Browser session for profile %s is unresponsive, relaunching", profile)
+                    self._count('crashes')
+                    session.quit()
+                session.launch()
+                self._count('launches')
+
+            try:
+                session.switch_to_tab(site_key)
+                yield session.driver
+            except WebDriverException:
+                # Timeouts and element errors leave the browser usable; only a browser
+                # that stopped answering is dropped, so the next caller gets a fresh one
+                if not session.is_healthy():
+                    logger.error("Browser session for profile %s crashed, dropping it", profile)
+                    self._count('crashes')
+                    session.quit()
+                raise
+            finally:
+                if session.driver is not None:
+                    session.pages += 1
+                    self._count('pages')
+                    if session.pages >= self.max_pages:
+                        logger.info("Recycling browser session for profile %s after %s pages", profile, session.pages)
+                        self._count('recycles')
+                        session.quit()
+
+    def stats(self):
+        """Return pool counters plus the state of each session"""
+        with self._lock:
+            stats = dict(self._stats)
+            sessions = list(self._sessions.values())
+        stats['sessions'] = {
+            session.profile: {
+                'alive': session.driver is not None,
+                'pages': session.pages,
+                'tabs': len(session.tabs)
+            }
+            for session in sessions
+        }
+        return stats
+
+    def close(self):
+        """Quit every browser session"""
+        with self._lock:
+            sessions = list(self._sessions.values())
+        for session in sessions:
+            with session.lock:
+                session.quit()
+        logger.info("Closed all browser sessions")
+
+
+# Shared by every browser-backed scrape in the process
+browser_pool = BrowserPool()
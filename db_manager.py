@@ -1,15 +1,732 @@
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
+from sqlalchemy import create_engine, delete, event, func, insert, select, text, tuple_, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from datetime import datetime, timedelta, timezone
+import abc
+import base64
+import json
+import logging
+import os
+import re
+import time
+
+logger = logging.getLogger(__name__)
 
 db = SQLAlchemy()
 
+# The one database file shared by the scraper and the web app, whatever directory
+# they are started from. FOROUM_DB_PATH points both somewhere else.
+DB_PATH = os.path.abspath(os.environ.get(
+    'FOROUM_DB_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'db', 'scraped_data.db')
+))
+
+# Set on every new connection. In WAL mode readers never wait for the writer and
+# the writer never waits for readers, so a page load does not stall behind a
+# scrape commit; synchronous=NORMAL is durable enough under WAL and makes commits
+# cheap. busy_timeout makes the rare writer/writer or checkpoint contention wait
+# instead of failing with "database is locked".
+SQLITE_PRAGMAS = (
+    ('busy_timeout', 5000),          # ms
+    ('synchronous', 'NORMAL'),
+    ('cache_size', -16384),          # KiB per connection
+    ('mmap_size', 256 * 1024 * 1024),
+    ('temp_store', 'MEMORY'),
+)
+
+# Only set by writable connections, the setting is stored in the database file
+SQLITE_WRITER_PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('journal_size_limit', 64 * 1024 * 1024),
+)
+
+# Connection pool of the web app, sized for the gunicorn threads of run.sh
+READER_POOL_SIZE = 8
+READER_POOL_OVERFLOW = 24
+
+# FOROUM_DATABASE_URL=postgresql+psycopg://... keeps everything in PostgreSQL instead
+# of the SQLite file, see db_postgres.py; the web app then reads from the comma
+# separated FOROUM_DATABASE_REPLICA_URLS when given.
+DATABASE_URL = os.environ.get('FOROUM_DATABASE_URL')
+DATABASE_REPLICA_URLS = [url for url in os.environ.get('FOROUM_DATABASE_REPLICA_URLS', '').split(',') if url]
+
+def create_db_engine(path=None, read_only=False):
+    """A standalone engine on the configured database, set up like the apps' engines"""
+    return storage.make_engine(read_only=read_only, path=path)
+
+def init_db(app, read_only=False, path=None):
+    """
+    Bind db to a Flask app on the configured database. The web app passes
+    read_only=True: its pooled connections cannot write, and schema changes go
+    through prepare_database() instead. `path` is a SQLite file to use instead of DB_PATH.
+    """
+    storage.init_app(app, read_only=read_only, path=path)
+
+def prepare_database(path=None):
+    """Create missing tables and run migrations, over a short-lived writable engine"""
+    storage.prepare(path)
+
+def _utcnow():
+    """Current UTC time, naive: DateTime columns hold naive UTC on every database"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+# Bumped whenever migrate_db() learns a new upgrade step; stored in PRAGMA user_version
+SCHEMA_VERSION = 4
+
 # Define a model for storing scraped topics
 class Topic(db.Model):
+    __table_args__ = (
+        db.Index('ux_topic_topic_url', 'topic_url', unique=True),
+        db.Index('ix_topic_site_key_timestamp', 'site_key', 'timestamp'),
+        db.Index('ix_topic_replies', 'replies'),
+        db.Index('ix_topic_last_activity', 'last_activity'),
+        db.Index('ix_topic_site_key_last_activity', 'site_key', 'last_activity'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     site_key = db.Column(db.String(50), nullable=False)
     title = db.Column(db.String(200), nullable=False)
     topic_url = db.Column(db.String(500), nullable=False)
     username = db.Column(db.String(100), nullable=True)
     replies = db.Column(db.Integer, nullable=False, default=0)
-    last_activity = db.Column(db.String(50), nullable=True)
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)  # Use datetime.utcnow
\ No newline at end of file
+    last_activity = db.Column(db.Integer, nullable=True)  # Unix epoch seconds
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow)  # Use datetime.utcnow
+
+# The homepage topics as of the last scrape cycle, published by the scraper so
+# the web app never has to aggregate the topic table itself. Only row 1 is used.
+class HomepageSnapshot(db.Model):
+    __tablename__ = 'homepage_snapshot'
+
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False)
+    topics = db.Column(db.Text, nullable=False)  # JSON list of topic dicts
+
+# Append-only log of the topics inserted or updated by the scraper, read by the
+# web app to push live updates. The id doubles as the SSE event id.
+class TopicChange(db.Model):
+    __tablename__ = 'topic_change'
+    __table_args__ = {'sqlite_autoincrement': True}  # ids must never be reused after pruning
+
+    id = db.Column(db.Integer, primary_key=True)
+    changed_at = db.Column(db.DateTime, nullable=False, index=True)
+    kind = db.Column(db.String(10), nullable=False)  # 'insert' or 'update'
+    site_key = db.Column(db.String(50), nullable=False)
+    title = db.Column(db.String(200), nullable=False)
+    topic_url = db.Column(db.String(500), nullable=False)
+    username = db.Column(db.String(100), nullable=True)
+    replies = db.Column(db.Integer, nullable=False, default=0)
+    last_activity = db.Column(db.Integer, nullable=True)
+
+# Reply counts of every topic over time, one row per scrape cycle in which the
+# count changed. WITHOUT ROWID: the rows are stored in the primary key b-tree,
+# which is all they are ever looked up by, so the table costs one b-tree, not two.
+class TopicHistory(db.Model):
+    __tablename__ = 'topic_history'
+    __table_args__ = (
+        # Covering index for "what moved since t", read by the trending ranking
+        db.Index('ix_topic_history_cycle_ts', 'cycle_ts', 'replies'),
+        {'sqlite_with_rowid': False}
+    )
+
+    topic_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    cycle_ts = db.Column(db.Integer, primary_key=True, autoincrement=False)  # Unix epoch seconds
+    replies = db.Column(db.Integer, nullable=False)
+
+# History older than HISTORY_FULL_RESOLUTION is downsampled to one point per topic
+# and HISTORY_BUCKET, and dropped entirely after HISTORY_RETENTION.
+HISTORY_FULL_RESOLUTION = timedelta(days=1)
+HISTORY_BUCKET = timedelta(hours=1)
+HISTORY_RETENTION = timedelta(days=30)
+
+# Replies gained over this window make a topic trending on the homepage
+TRENDING_WINDOW = timedelta(hours=2)
+
+# How long changes stay in the log; clients reconnecting later just reload the page
+CHANGE_RETENTION = timedelta(hours=1)
+
+# Homepage selection in one statement: the latest `per_site` topics of every site,
+# topped up to `total` rows with the trending topics (most replies gained since
+# :since), then, on quiet days, with the most replied topics not already picked.
+# "Moved since" is a range scan of ix_topic_history_cycle_ts; each moved topic's
+# baseline (its count just before the window) is one primary key seek.
+HOMEPAGE_QUERY = text("""
+    WITH latest AS (
+        SELECT id FROM (
+            SELECT id, ROW_NUMBER() OVER (PARTITION BY site_key ORDER BY timestamp DESC) AS rank
+            FROM topic
+        ) WHERE rank <= :per_site
+    ),
+    moved AS (
+        SELECT topic_id, MIN(cycle_ts) AS first_ts, MAX(replies) AS replies
+        FROM topic_history
+        WHERE cycle_ts >= :since
+        GROUP BY topic_id
+    ),
+    trending AS (
+        SELECT topic_id AS id FROM (
+            SELECT m.topic_id, m.replies - coalesce(
+                (SELECT h.replies FROM topic_history h
+                 WHERE h.topic_id = m.topic_id AND h.cycle_ts < :since
+                 ORDER BY h.cycle_ts DESC LIMIT 1),
+                (SELECT h.replies FROM topic_history h
+                 WHERE h.topic_id = m.topic_id AND h.cycle_ts = m.first_ts)
+            ) AS gained
+            FROM moved m
+            WHERE m.topic_id NOT IN latest
+        )
+        WHERE gained > 0
+        ORDER BY gained DESC
+        LIMIT max(:total - (SELECT COUNT(*) FROM latest), 0)
+    ),
+    most_replied AS (
+        SELECT id FROM topic
+        WHERE id NOT IN latest AND id NOT IN trending
+        ORDER BY replies DESC
+        LIMIT max(:total - (SELECT COUNT(*) FROM latest) - (SELECT COUNT(*) FROM trending), 0)
+    )
+    SELECT site_key, title, topic_url, username, replies, last_activity, timestamp
+    FROM topic
+    WHERE id IN (SELECT id FROM latest UNION ALL SELECT id FROM trending UNION ALL SELECT id FROM most_replied)
+    ORDER BY last_activity DESC
+""")
+
+def homepage_topics(total=60, per_site=5):
+    """
+    Return the homepage topics as plain rows (site_key, title, topic_url, username,
+    replies, last_activity, timestamp), most recently active first.
+    """
+    since = int((datetime.now(timezone.utc) - TRENDING_WINDOW).timestamp())
+    return db.session.execute(storage.homepage_query, {'total': total, 'per_site': per_site, 'since': since}).all()
+
+def publish_snapshot():
+    """
+    Compute the homepage topics and publish them as the new snapshot. The snapshot
+    row is replaced by a single upsert, so readers see either the old or the new
+    version, never a partial one. Returns the new snapshot version.
+    """
+    topics = [
+        {key: value if not isinstance(value, datetime) else value.isoformat() for key, value in row._mapping.items()}
+        for row in homepage_topics()
+    ]
+    stmt = storage.insert(HomepageSnapshot).values(
+        id=1, version=1, created_at=_utcnow(), topics=json.dumps(topics)
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[HomepageSnapshot.id],
+        set_={
+            'version': HomepageSnapshot.version + 1,
+            'created_at': stmt.excluded.created_at,
+            'topics': stmt.excluded.topics
+        }
+    )
+    db.session.execute(stmt)
+    db.session.commit()
+    return db.session.execute(select(HomepageSnapshot.version).where(HomepageSnapshot.id == 1)).scalar()
+
+def snapshot_version():
+    """
+    Return (version, created_at) of the published homepage snapshot without loading
+    its topics, or None if none was published yet.
+    """
+    row = db.session.execute(
+        select(HomepageSnapshot.version, HomepageSnapshot.created_at).where(HomepageSnapshot.id == 1)
+    ).first()
+    return tuple(row) if row else None
+
+def read_snapshot(decode=True):
+    """
+    Return the published homepage snapshot as (version, created_at, topics),
+    or None if the scraper has not published one yet. All three come from one
+    row read, so the topics always belong to that version. With decode=False
+    the topics are left as their JSON text, for callers that may not need them.
+    """
+    row = db.session.execute(
+        select(HomepageSnapshot.version, HomepageSnapshot.created_at, HomepageSnapshot.topics)
+        .where(HomepageSnapshot.id == 1)
+    ).first()
+    if row is None:
+        return None
+    return row.version, row.created_at, json.loads(row.topics) if decode else row.topics
+
+# Orderings offered by query_topics(); the id tie-breaker makes every key unique
+TOPIC_SORTS = {
+    'last_activity': Topic.last_activity,
+    'replies': Topic.replies,
+    'timestamp': Topic.timestamp
+}
+
+# Keeps, among the history points older than :cutoff, only the last one of each
+# topic and bucket. Row values need SQLite 3.15+.
+DOWNSAMPLE_HISTORY = text("""
+    DELETE FROM topic_history
+    WHERE cycle_ts < :cutoff
+      AND (topic_id, cycle_ts) NOT IN (
+          SELECT topic_id, MAX(cycle_ts) FROM topic_history
+          WHERE cycle_ts < :cutoff
+          GROUP BY topic_id, cycle_ts / :bucket
+      )
+""")
+
+def compact_history():
+    """
+    Apply the history retention policy: downsample points older than
+    HISTORY_FULL_RESOLUTION and drop those older than HISTORY_RETENTION.
+    Returns the number of deleted rows.
+    """
+    now = datetime.now(timezone.utc)
+    dropped = db.session.execute(
+        delete(TopicHistory).where(TopicHistory.cycle_ts < int((now - HISTORY_RETENTION).timestamp()))
+    ).rowcount
+    downsampled = db.session.execute(DOWNSAMPLE_HISTORY, {
+        'cutoff': int((now - HISTORY_FULL_RESOLUTION).timestamp()),
+        'bucket': int(HISTORY_BUCKET.total_seconds())
+    }).rowcount
+    db.session.commit()
+    return dropped + downsampled
+
+def changes_since(last_id, limit=500):
+    """Return the logged topic changes with an id greater than last_id, oldest first"""
+    return db.session.execute(
+        select(
+            TopicChange.id, TopicChange.kind, TopicChange.site_key, TopicChange.title, TopicChange.topic_url,
+            TopicChange.username, TopicChange.replies, TopicChange.last_activity
+        )
+        .where(TopicChange.id > last_id)
+        .order_by(TopicChange.id)
+        .limit(limit)
+    ).all()
+
+def latest_change_id():
+    """Return the id of the most recent logged change, 0 if the log is empty"""
+    return db.session.execute(select(func.max(TopicChange.id))).scalar() or 0
+
+def prune_changes():
+    """Drop logged changes older than CHANGE_RETENTION"""
+    cutoff = _utcnow() - CHANGE_RETENTION
+    db.session.execute(delete(TopicChange).where(TopicChange.changed_at < cutoff))
+    db.session.commit()
+
+def encode_cursor(sort, row):
+    """Opaque keyset cursor pointing just after `row` in the `sort` ordering"""
+    value = getattr(row, sort)
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    return base64.urlsafe_b64encode(json.dumps([value, row.id]).encode()).decode().rstrip('=')
+
+def decode_cursor(sort, cursor):
+    """Inverse of encode_cursor(). Raises ValueError on a malformed cursor."""
+    try:
+        value, topic_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        # Only values encode_cursor() can produce ever reach the keyset SQL
+        if type(topic_id) is not int:
+            raise ValueError(f"cursor id is not an integer: {topic_id!r}")
+        if value is None:
+            return value, topic_id
+        if sort == 'timestamp':
+            if not isinstance(value, str):
+                raise ValueError(f"cursor value is not a timestamp: {value!r}")
+            return datetime.fromisoformat(value), topic_id
+        if type(value) is not int:
+            raise ValueError(f"cursor value is not an integer: {value!r}")
+        return value, topic_id
+    except (TypeError, ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+def query_topics(site_key=None, since=None, min_replies=None, sort='last_activity', order='desc',
+                 limit=50, cursor=None):
+    """
+    Page through topics with keyset pagination: instead of an OFFSET, each page
+    starts strictly after the (sort value, id) of the previous page's last row,
+    so deep pages cost the same as the first one.
+    Topics without a sort value (no last_activity yet) come last in both orders.
+    `since` keeps topics whose last_activity is at or after that epoch.
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    sort_column = TOPIC_SORTS[sort]
+    query = select(
+        Topic.id, Topic.site_key, Topic.title, Topic.topic_url, Topic.username,
+        Topic.replies, Topic.last_activity, Topic.timestamp
+    )
+
+    if site_key is not None:
+        query = query.where(Topic.site_key == site_key)
+    if since is not None:
+        query = query.where(Topic.last_activity >= since)
+    if min_replies is not None:
+        query = query.where(Topic.replies >= min_replies)
+
+    descending = order == 'desc'
+    id_order = Topic.id.desc() if descending else Topic.id.asc()
+    after = decode_cursor(sort, cursor) if cursor is not None else None
+
+    # Row-value comparisons never match NULL, so topics with a NULL sort value are
+    # a separate final segment, paged by id alone once the others are exhausted.
+    # Each segment fetches one extra row to know whether another page exists.
+    rows = []
+    if after is None or after[0] is not None:
+        valued = query.where(sort_column.isnot(None))
+        if after is not None:
+            key = tuple_(sort_column, Topic.id)
+            valued = valued.where(key < tuple_(*after) if descending else key > tuple_(*after))
+        valued = valued.order_by(sort_column.desc() if descending else sort_column.asc(), id_order)
+        rows = db.session.execute(valued.limit(limit + 1)).all()
+    if len(rows) <= limit:
+        unvalued = query.where(sort_column.is_(None))
+        if after is not None and after[0] is None:
+            unvalued = unvalued.where(Topic.id < after[1] if descending else Topic.id > after[1])
+        rows += db.session.execute(unvalued.order_by(id_order).limit(limit + 1 - len(rows))).all()
+
+    next_cursor = encode_cursor(sort, rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+# Full-text index over topic titles and usernames. It is an external-content
+# FTS5 table: it stores only the index, the text stays in topic and triggers keep
+# the two in sync whatever writes the topic table. unicode61 with
+# remove_diacritics 2 folds case and accents ("eleve" finds "Élevé"), and the
+# prefix indexes make short prefix queries ("fran*") index lookups too.
+TOPIC_SEARCH_DDL = (
+    """CREATE VIRTUAL TABLE IF NOT EXISTS topic_search USING fts5(
+        title, username,
+        content='topic', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS topic_search_insert AFTER INSERT ON topic BEGIN
+        INSERT INTO topic_search (rowid, title, username) VALUES (new.id, new.title, new.username);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS topic_search_delete AFTER DELETE ON topic BEGIN
+        INSERT INTO topic_search (topic_search, rowid, title, username) VALUES ('delete', old.id, old.title, old.username);
+    END""",
+    # Most scraper updates only touch replies and last_activity, which skip this trigger
+    """CREATE TRIGGER IF NOT EXISTS topic_search_update AFTER UPDATE OF title, username ON topic BEGIN
+        INSERT INTO topic_search (topic_search, rowid, title, username) VALUES ('delete', old.id, old.title, old.username);
+        INSERT INTO topic_search (rowid, title, username) VALUES (new.id, new.title, new.username);
+    END""",
+    # Titles weigh more than usernames in the bm25 rank
+    "INSERT INTO topic_search (topic_search, rank) VALUES ('rank', 'bm25(4.0, 1.0)')"
+)
+
+# Search in two steps: the best SEARCH_CANDIDATES matches by bm25 come straight
+# from the index (ORDER BY rank is optimized by FTS5), then only those are
+# re-ranked with a recency bonus. bm25 scores are negative, lower is better; a
+# topic active right now gains :recency_weight, one active a day ago half of it.
+SEARCH_QUERY = text("""
+    WITH candidates AS (
+        SELECT rowid AS id, rank FROM topic_search
+        WHERE topic_search MATCH :match
+        ORDER BY rank
+        LIMIT :candidates
+    )
+    SELECT t.site_key, t.title, t.topic_url, t.username, t.replies, t.last_activity, t.timestamp
+    FROM candidates c JOIN topic t ON t.id = c.id
+    ORDER BY c.rank - :recency_weight / (1.0 + max(:now - coalesce(t.last_activity, 0), 0) / 86400.0)
+    LIMIT :limit
+""")
+
+SEARCH_CANDIDATES = 200
+SEARCH_RECENCY_WEIGHT = 2.0
+SEARCH_MAX_TERMS = 10
+
+_search_term = re.compile(r'\w+')
+
+def search_match(query):
+    """
+    Turn free user input into an FTS5 MATCH expression: every word must appear,
+    as a prefix. Words are quoted, so FTS5 operators typed by users stay plain text.
+    Returns None when the input has no word at all.
+    """
+    terms = _search_term.findall(query)[:SEARCH_MAX_TERMS]
+    if not terms:
+        return None
+    return ' '.join(f'"{term}"*' for term in terms)
+
+def search_topics(query, limit=50):
+    """
+    Return the topics whose title or username match `query`, best first,
+    as plain rows like homepage_topics().
+    """
+    return storage.search_topics(query, limit)
+
+def migrate_db(engine=None):
+    """
+    Upgrade an existing database file in place, up to SCHEMA_VERSION.
+    Meant to run right after db.create_all(), which only creates missing tables.
+    The whole upgrade runs in one IMMEDIATE transaction, so the scraper and the
+    web app can both call it at startup without stepping on each other.
+    """
+    engine = engine or db.engine
+    with engine.connect() as conn:
+        conn.exec_driver_sql('BEGIN IMMEDIATE')
+        version = conn.exec_driver_sql('PRAGMA user_version').scalar()
+        if version < 1:
+            _migrate_topic_v1(conn)
+        if version < 2:
+            _create_missing_indexes(conn)
+        if version < 3:
+            _create_topic_search(conn)
+        if version < 4:
+            _seed_topic_history(conn)
+        if version < SCHEMA_VERSION:
+            conn.exec_driver_sql(f'PRAGMA user_version = {SCHEMA_VERSION}')
+            logger.info("Database schema upgraded from version %s to %s", version, SCHEMA_VERSION)
+        conn.commit()
+
+def _migrate_topic_v1(conn):
+    """
+    Version 1: last_activity becomes an INTEGER epoch, topic_url becomes unique
+    and the lookup/homepage indexes are added. SQLite cannot change a column type,
+    so a pre-v1 topic table is rebuilt, keeping the newest row of duplicated URLs.
+    """
+    columns = {row[1]: row[2] for row in conn.exec_driver_sql('PRAGMA table_info(topic)')}
+    if columns.get('last_activity', '').upper() != 'INTEGER':
+        conn.exec_driver_sql('ALTER TABLE topic RENAME TO topic_pre_v1')
+        Topic.__table__.create(conn)
+        conn.exec_driver_sql(
+            'INSERT INTO topic (id, site_key, title, topic_url, username, replies, last_activity, timestamp) '
+            'SELECT id, site_key, title, topic_url, username, replies, CAST(last_activity AS INTEGER), timestamp '
+            'FROM topic_pre_v1 WHERE id IN (SELECT MAX(id) FROM topic_pre_v1 GROUP BY topic_url)'
+        )
+        conn.exec_driver_sql('DROP TABLE topic_pre_v1')
+    else:
+        _create_missing_indexes(conn)
+
+def _create_missing_indexes(conn):
+    """Version 2: (site_key, last_activity) index for the per-site API listing"""
+    for index in Topic.__table__.indexes:
+        index.create(conn, checkfirst=True)
+
+def _create_topic_search(conn):
+    """Version 3: full-text search index, its sync triggers, and a first build"""
+    for statement in TOPIC_SEARCH_DDL:
+        conn.exec_driver_sql(statement)
+    conn.exec_driver_sql("INSERT INTO topic_search (topic_search) VALUES ('rebuild')")
+
+def _seed_topic_history(conn):
+    """
+    Version 4: topic_history (created by create_all) starts from the current reply
+    counts, so the first trending window has a baseline to compare against.
+    """
+    TopicHistory.__table__.create(conn, checkfirst=True)
+    conn.exec_driver_sql(
+        "INSERT OR IGNORE INTO topic_history (topic_id, cycle_ts, replies) "
+        "SELECT id, CAST(strftime('%s', 'now') AS INTEGER), replies FROM topic"
+    )
+
+# Records the reply count of a just written topic, looked up by URL so that newly
+# inserted topics, whose ids the executemany INSERT does not return, are covered too.
+# Plain ON CONFLICT, understood by both SQLite and PostgreSQL.
+RECORD_HISTORY = text("""
+    INSERT INTO topic_history (topic_id, cycle_ts, replies)
+    SELECT id, :cycle_ts, replies FROM topic WHERE topic_url = :topic_url
+    ON CONFLICT (topic_id, cycle_ts) DO UPDATE SET replies = excluded.replies
+""")
+
+def upsert_topics(site_key, topics):
+    """
+    Write a site's batch of parsed topics in bulk: one SELECT to find the rows that
+    already exist, one executemany INSERT ... ON CONFLICT(topic_url) for new topics
+    and one executemany UPDATE for topics whose fields changed. Unchanged topics
+    are not touched.
+    Returns a dict with the number of inserted, updated and unchanged topics.
+    """
+    # Deduplicate on URL, the last occurrence in the batch wins
+    batch = {}
+    for topic in topics:
+        batch[topic['topic_url']] = {
+            'site_key': site_key,
+            'title': topic['title'],
+            'topic_url': topic['topic_url'],
+            'username': topic['username'],
+            'replies': int(topic['replies']),
+            'last_activity': topic['last_activity']
+        }
+
+    counts = {'inserted': 0, 'updated': 0, 'unchanged': 0}
+    if not batch:
+        return counts
+
+    existing = db.session.execute(
+        select(Topic.id, Topic.topic_url, Topic.title, Topic.username, Topic.replies, Topic.last_activity)
+        .where(Topic.topic_url.in_(list(batch)))
+    ).all()
+    existing = {row.topic_url: row for row in existing}
+
+    now = _utcnow()
+    new_rows = []
+    changed_rows = []
+    changed_urls = []
+    history_urls = []
+    for topic_url, row in batch.items():
+        current = existing.get(topic_url)
+        if current is None:
+            new_rows.append(dict(row, timestamp=now))
+            history_urls.append(topic_url)
+        elif (current.title, current.username, current.replies, current.last_activity) != \
+                (row['title'], row['username'], row['replies'], row['last_activity']):
+            changed_urls.append(topic_url)
+            if current.replies != row['replies']:
+                history_urls.append(topic_url)
+            changed_rows.append({
+                'id': current.id,
+                'title': row['title'],
+                'username': row['username'],
+                'replies': row['replies'],
+                'last_activity': row['last_activity'],
+                'timestamp': now
+            })
+        else:
+            counts['unchanged'] += 1
+
+    if new_rows:
+        # A row inserted by another process since the SELECT is updated instead of failing
+        stmt = storage.insert(Topic)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Topic.topic_url],
+            set_={column: stmt.excluded[column] for column in ('title', 'username', 'replies', 'last_activity', 'timestamp')}
+        )
+        db.session.execute(stmt, new_rows)
+    if changed_rows:
+        db.session.execute(update(Topic), changed_rows)
+    if new_rows or changed_rows:
+        changes = [dict(row, kind='insert', changed_at=now) for row in new_rows]
+        changes += [dict(batch[topic_url], kind='update', changed_at=now) for topic_url in changed_urls]
+        for change in changes:
+            change.pop('timestamp', None)
+        db.session.execute(insert(TopicChange), changes)
+    if history_urls:
+        # Only reply count changes are recorded, so a quiet topic costs nothing
+        cycle_ts = int(now.replace(tzinfo=timezone.utc).timestamp())
+        db.session.execute(RECORD_HISTORY, [{'cycle_ts': cycle_ts, 'topic_url': topic_url} for topic_url in history_urls])
+    db.session.commit()
+
+    counts['inserted'] = len(new_rows)
+    counts['updated'] = len(changed_rows)
+    return counts
+
+class Storage(abc.ABC):
+    """
+    Where the topics live. The operations of this module (batch upsert, homepage
+    snapshot, paged query, change log, history) are written once against
+    SQLAlchemy; a Storage supplies what differs from one database to another:
+    engines and their connection setup, schema creation and migrations, the
+    dialect's INSERT ... ON CONFLICT construct, the homepage query and full-text
+    search.
+    """
+    # Backends set these as class attributes; one left out keeps the class abstract
+
+    @property
+    @abc.abstractmethod
+    def name(self):
+        """Short name of the backend, e.g. 'sqlite'"""
+
+    @property
+    @abc.abstractmethod
+    def insert(self):
+        """The dialect's insert(), offering on_conflict_do_update()"""
+
+    @property
+    @abc.abstractmethod
+    def homepage_query(self):
+        """text() selecting the homepage topics, taking :total, :per_site and :since"""
+
+    @abc.abstractmethod
+    def database_uri(self, read_only=False, path=None):
+        """SQLAlchemy URL of the primary, or of the database read-only engines use"""
+
+    def engine_options(self, read_only=False):
+        return {}
+
+    def on_connect(self, read_only=False):
+        """Listener run on every new DBAPI connection, or None"""
+        return None
+
+    def make_engine(self, read_only=False, path=None):
+        engine = create_engine(self.database_uri(read_only, path), **self.engine_options(read_only))
+        listener = self.on_connect(read_only)
+        if listener is not None:
+            event.listen(engine, 'connect', listener)
+        return engine
+
+    def init_app(self, app, read_only=False, path=None):
+        app.config['SQLALCHEMY_DATABASE_URI'] = self.database_uri(read_only, path)
+        app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = self.engine_options(read_only)
+        db.init_app(app)
+        listener = self.on_connect(read_only)
+        if listener is not None:
+            with app.app_context():
+                event.listen(db.engine, 'connect', listener)
+
+    @abc.abstractmethod
+    def prepare(self, path=None):
+        """Create missing tables, indexes and functions, and run migrations"""
+
+    @abc.abstractmethod
+    def search_topics(self, query, limit):
+        """Full-text search, see db_manager.search_topics()"""
+
+class SQLiteStorage(Storage):
+    """The default: one SQLite file shared by the scraper and the web app, in WAL mode"""
+    name = 'sqlite'
+    insert = staticmethod(sqlite_insert)
+    homepage_query = HOMEPAGE_QUERY
+
+    def __init__(self, path=DB_PATH):
+        self.path = path
+
+    def database_uri(self, read_only=False, path=None):
+        return f'sqlite:///{path or self.path}'
+
+    def engine_options(self, read_only=False):
+        options = {'connect_args': {'check_same_thread': False}}
+        if read_only:
+            options.update(pool_size=READER_POOL_SIZE, max_overflow=READER_POOL_OVERFLOW)
+        return options
+
+    def on_connect(self, read_only=False):
+        def apply_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            pragmas = SQLITE_PRAGMAS if read_only else SQLITE_PRAGMAS + SQLITE_WRITER_PRAGMAS
+            for name, value in pragmas:
+                cursor.execute(f'PRAGMA {name} = {value}')
+            if read_only:
+                # Any write attempt fails instead of taking the write lock
+                cursor.execute('PRAGMA query_only = ON')
+            cursor.close()
+        return apply_pragmas
+
+    def init_app(self, app, read_only=False, path=None):
+        os.makedirs(os.path.dirname(path or self.path), exist_ok=True)
+        super().init_app(app, read_only, path)
+
+    def prepare(self, path=None):
+        os.makedirs(os.path.dirname(path or self.path), exist_ok=True)
+        engine = self.make_engine(path=path)
+        try:
+            db.metadata.create_all(engine)
+            migrate_db(engine)
+        finally:
+            engine.dispose()
+
+    def search_topics(self, query, limit):
+        match = search_match(query)
+        if match is None:
+            return []
+        return db.session.execute(SEARCH_QUERY, {
+            'match': match,
+            'candidates': max(SEARCH_CANDIDATES, limit),
+            'recency_weight': SEARCH_RECENCY_WEIGHT,
+            'now': int(time.time()),
+            'limit': limit
+        }).all()
+
+def _load_storage():
+    if not DATABASE_URL:
+        return SQLiteStorage(DB_PATH)
+    if DATABASE_URL.startswith('postgresql'):
+        from db_postgres import PostgresStorage
+        return PostgresStorage(DATABASE_URL, DATABASE_REPLICA_URLS)
+    raise ValueError(f"Unsupported FOROUM_DATABASE_URL, expected a postgresql:// URL: {DATABASE_URL}")
+
+# The storage every function of this module runs against
+storage = _load_storage()
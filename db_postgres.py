@@ -0,0 +1,156 @@
+from sqlalchemy import create_engine, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+import random
+import time
+
+from db_manager import SEARCH_CANDIDATES, SEARCH_MAX_TERMS, Storage, _search_term, db
+
+# PostgreSQL storage, for several web nodes reading the same data. The scraper
+# writes to the primary (FOROUM_DATABASE_URL); every web process picks one of
+# FOROUM_DATABASE_REPLICA_URLS, when given, and reads from it. Needs a driver,
+# e.g. `pip install "psycopg[binary]"` with a postgresql+psycopg:// URL.
+
+# Connections kept per process, and how many more a burst may open
+POOL_SIZE = 8
+POOL_OVERFLOW = 24
+# Servers and proxies drop idle connections; recycle them before that
+POOL_RECYCLE = 1800
+
+# Serializes schema setup between processes starting at the same time
+SCHEMA_LOCK_ID = 0x666f726f
+
+# Full-text search runs on an expression index. unaccent() is not IMMUTABLE, so it
+# cannot appear in an index directly; the wrapper pins its dictionary and is.
+# The 'simple' configuration only lowercases: no stemming, like SQLite's unicode61.
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('simple', foroum_unaccent(title)), 'A') || "
+    "setweight(to_tsvector('simple', foroum_unaccent(coalesce(username, ''))), 'B')"
+)
+
+SCHEMA_DDL = (
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    "CREATE OR REPLACE FUNCTION foroum_unaccent(text) RETURNS text "
+    "LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT "
+    "AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$",
+    f"CREATE INDEX IF NOT EXISTS ix_topic_search ON topic USING gin (({SEARCH_VECTOR}))",
+)
+
+# Same selection as db_manager.HOMEPAGE_QUERY, in PostgreSQL's dialect
+HOMEPAGE_QUERY = text("""
+    WITH latest AS (
+        SELECT id FROM (
+            SELECT id, ROW_NUMBER() OVER (PARTITION BY site_key ORDER BY timestamp DESC) AS rank
+            FROM topic
+        ) ranked WHERE rank <= :per_site
+    ),
+    moved AS (
+        SELECT topic_id, MIN(cycle_ts) AS first_ts, MAX(replies) AS replies
+        FROM topic_history
+        WHERE cycle_ts >= :since
+        GROUP BY topic_id
+    ),
+    trending AS (
+        SELECT topic_id AS id FROM (
+            SELECT m.topic_id, m.replies - coalesce(
+                (SELECT h.replies FROM topic_history h
+                 WHERE h.topic_id = m.topic_id AND h.cycle_ts < :since
+                 ORDER BY h.cycle_ts DESC LIMIT 1),
+                (SELECT h.replies FROM topic_history h
+                 WHERE h.topic_id = m.topic_id AND h.cycle_ts = m.first_ts)
+            ) AS gained
+            FROM moved m
+            WHERE m.topic_id NOT IN (SELECT id FROM latest)
+        ) velocity
+        WHERE gained > 0
+        ORDER BY gained DESC
+        LIMIT GREATEST(:total - (SELECT COUNT(*) FROM latest), 0)
+    ),
+    most_replied AS (
+        SELECT id FROM topic
+        WHERE id NOT IN (SELECT id FROM latest) AND id NOT IN (SELECT id FROM trending)
+        ORDER BY replies DESC
+        LIMIT GREATEST(:total - (SELECT COUNT(*) FROM latest) - (SELECT COUNT(*) FROM trending), 0)
+    )
+    SELECT site_key, title, topic_url, username, replies, last_activity, timestamp
+    FROM topic
+    WHERE id IN (SELECT id FROM latest UNION ALL SELECT id FROM trending UNION ALL SELECT id FROM most_replied)
+    ORDER BY last_activity DESC NULLS LAST
+""")
+
+# Best SEARCH_CANDIDATES matches by ts_rank_cd (normalized to 0..1 by flag 32),
+# then a recency bonus: a topic active right now gains :recency_weight.
+SEARCH_QUERY = text(f"""
+    WITH candidates AS (
+        SELECT id, ts_rank_cd({SEARCH_VECTOR}, query, 32) AS rank
+        FROM topic, to_tsquery('simple', foroum_unaccent(:match)) AS query
+        WHERE ({SEARCH_VECTOR}) @@ query
+        ORDER BY rank DESC
+        LIMIT :candidates
+    )
+    SELECT t.site_key, t.title, t.topic_url, t.username, t.replies, t.last_activity, t.timestamp
+    FROM candidates c JOIN topic t ON t.id = c.id
+    ORDER BY c.rank + :recency_weight / (1.0 + GREATEST(:now - coalesce(t.last_activity, 0), 0) / 86400.0) DESC
+    LIMIT :limit
+""")
+
+# ts_rank_cd scores are far smaller than bm25's, so is the recency bonus
+SEARCH_RECENCY_WEIGHT = 0.1
+
+
+def search_tsquery(query):
+    """Every word of the user input as a prefix, all required: 'fran:* & elect:*'"""
+    terms = _search_term.findall(query)[:SEARCH_MAX_TERMS]
+    if not terms:
+        return None
+    return ' & '.join(f'{term}:*' for term in terms)
+
+
+class PostgresStorage(Storage):
+    """PostgreSQL with pooled connections, native upserts and optional read replicas"""
+    name = 'postgresql'
+    insert = staticmethod(pg_insert)
+    homepage_query = HOMEPAGE_QUERY
+
+    def __init__(self, url, replica_urls=()):
+        self.url = url
+        self.replica_urls = list(replica_urls)
+
+    def database_uri(self, read_only=False, path=None):
+        # Each web process sticks to one replica; load spreads across processes
+        if read_only and self.replica_urls:
+            return random.choice(self.replica_urls)
+        return self.url
+
+    def engine_options(self, read_only=False):
+        options = {
+            'pool_size': POOL_SIZE,
+            'max_overflow': POOL_OVERFLOW,
+            'pool_recycle': POOL_RECYCLE,
+            'pool_pre_ping': True
+        }
+        if read_only:
+            options['connect_args'] = {'options': '-c default_transaction_read_only=on'}
+        return options
+
+    def prepare(self, path=None):
+        engine = create_engine(self.url)
+        try:
+            with engine.begin() as conn:
+                conn.execute(text('SELECT pg_advisory_xact_lock(:lock_id)'), {'lock_id': SCHEMA_LOCK_ID})
+                db.metadata.create_all(conn)
+                for statement in SCHEMA_DDL:
+                    conn.exec_driver_sql(statement)
+        finally:
+            engine.dispose()
+
+    def search_topics(self, query, limit):
+        match = search_tsquery(query)
+        if match is None:
+            return []
+        return db.session.execute(SEARCH_QUERY, {
+            'match': match,
+            'candidates': max(SEARCH_CANDIDATES, limit),
+            'recency_weight': SEARCH_RECENCY_WEIGHT,
+            'now': int(time.time()),
+            'limit': limit
+        }).all()
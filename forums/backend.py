@@ -0,0 +1,165 @@
+from functools import lru_cache
+import abc
+import os
+
+# Which HTML parser the forum parsers run on: 'selectolax', 'lxml', 'bs4', or
+# 'auto' for the fastest one installed. Set FOROUM_PARSER_BACKEND=bs4 to fall
+# back to the original BeautifulSoup parsing.
+BACKEND = os.environ.get('FOROUM_PARSER_BACKEND', 'auto')
+
+
+def parse_html(html_content, backend=None):
+    """
+    Parse a page with the configured backend and return its root Node.
+    All backends expose the same small Node API, so the parsers produce
+    the same topic dicts whichever one is used.
+    """
+    backend = _resolve(backend or BACKEND)
+    if backend == 'selectolax':
+        from selectolax.lexbor import LexborHTMLParser
+        return SelectolaxNode(LexborHTMLParser(html_content).root)
+    if backend == 'lxml':
+        import lxml.html
+        return LxmlNode(lxml.html.document_fromstring(html_content))
+    from bs4 import BeautifulSoup
+    return SoupNode(BeautifulSoup(html_content, 'html.parser'))
+
+
+@lru_cache(maxsize=None)
+def _resolve(backend):
+    """Map 'auto' to the fastest installed backend"""
+    if backend != 'auto':
+        return backend
+    try:
+        import selectolax.lexbor  # noqa: F401
+        return 'selectolax'
+    except ImportError:
+        pass
+    try:
+        import lxml.html  # noqa: F401
+        import cssselect  # noqa: F401
+        return 'lxml'
+    except ImportError:
+        return 'bs4'
+
+
+class Node(abc.ABC):
+    """
+    Backend-neutral element. text() follows BeautifulSoup's get_text(strip=True):
+    every text fragment is stripped and the non-empty ones are joined with no separator.
+    A backend missing any of the abstract methods cannot be instantiated.
+    """
+    __slots__ = ()
+
+    @abc.abstractmethod
+    def select(self, selector):
+        """Every descendant matching a CSS selector, as Nodes"""
+
+    @abc.abstractmethod
+    def select_one(self, selector):
+        """The first descendant matching a CSS selector, or None"""
+
+    @abc.abstractmethod
+    def text(self):
+        """The stripped text fragments, joined"""
+
+    @abc.abstractmethod
+    def get(self, attribute, default=None):
+        """Value of an attribute, or default"""
+
+    @property
+    @abc.abstractmethod
+    def parent(self):
+        """The parent element as a Node, or None"""
+
+    def __getitem__(self, attribute):
+        value = self.get(attribute)
+        if value is None:
+            raise KeyError(attribute)
+        return value
+
+
+class SelectolaxNode(Node):
+    __slots__ = ('_node',)
+
+    def __init__(self, node):
+        self._node = node
+
+    def select(self, selector):
+        return [SelectolaxNode(node) for node in self._node.css(selector)]
+
+    def select_one(self, selector):
+        node = self._node.css_first(selector)
+        return SelectolaxNode(node) if node is not None else None
+
+    def text(self):
+        return self._node.text(deep=True, separator='', strip=True)
+
+    def get(self, attribute, default=None):
+        value = self._node.attributes.get(attribute, default)
+        return default if value is None else value
+
+    @property
+    def parent(self):
+        node = self._node.parent
+        return SelectolaxNode(node) if node is not None else None
+
+
+@lru_cache(maxsize=256)
+def _css(selector):
+    """Compile a CSS selector to XPath once; parsers reuse the same few selectors"""
+    from lxml.cssselect import CSSSelector
+    return CSSSelector(selector, translator='html')
+
+
+class LxmlNode(Node):
+    __slots__ = ('_element',)
+
+    def __init__(self, element):
+        self._element = element
+
+    def select(self, selector):
+        # cssselect matches the context element itself too; BeautifulSoup does not
+        return [LxmlNode(element) for element in _css(selector)(self._element) if element is not self._element]
+
+    def select_one(self, selector):
+        for element in _css(selector)(self._element):
+            if element is not self._element:
+                return LxmlNode(element)
+        return None
+
+    def text(self):
+        return ''.join(part.strip() for part in self._element.xpath('.//text()'))
+
+    def get(self, attribute, default=None):
+        return self._element.get(attribute, default)
+
+    @property
+    def parent(self):
+        element = self._element.getparent()
+        return LxmlNode(element) if element is not None else None
+
+
+class SoupNode(Node):
+    __slots__ = ('_tag',)
+
+    def __init__(self, tag):
+        self._tag = tag
+
+    def select(self, selector):
+        return [SoupNode(tag) for tag in self._tag.select(selector)]
+
+    def select_one(self, selector):
+        tag = self._tag.select_one(selector)
+        return SoupNode(tag) if tag is not None else None
+
+    def text(self):
+        return self._tag.get_text(strip=True)
+
+    def get(self, attribute, default=None):
+        return self._tag.get(attribute, default)
+
+    @property
+    def parent(self):
+        tag = self._tag.parent
+        return SoupNode(tag) if tag is not None else None
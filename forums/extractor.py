@@ -0,0 +1,103 @@
+from forums.backend import parse_html
+from sutils import TimestampNormalizer
+from collections import namedtuple
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+TOPIC_FIELDS = ('title', 'topic_url', 'username', 'replies', 'last_activity')
+
+DATE_FORMATS = ('absolute', 'relative')
+
+# What a parser returns. `failed` counts the rows dropped on an error plus the kept
+# rows whose date could not be read; the caller records it, since parsers may run in
+# another process whose metrics nobody collects.
+ParsedPage = namedtuple('ParsedPage', ['topics', 'failed'])
+
+
+def _compile_field(field):
+    """
+    Turn a field spec from sites.py into a function reading that field from
+    a row Node. Regexes are compiled once, here, not per row.
+    """
+    selector = field.get('selector')
+    attr = field.get('attr')
+    parent = field.get('parent', False)
+    prefix = field.get('prefix', '')
+    default = field.get('default')
+    sub = field.get('sub')
+    pattern, replacement = (re.compile(sub[0]), sub[1]) if sub else (None, None)
+
+    def read(node):
+        element = node.select_one(selector) if selector else node
+        if element is not None and parent:
+            element = element.parent
+        if element is None:
+            return default
+        value = element.get(attr) if attr else element.text()
+        if value is None:
+            return default
+        if pattern is not None:
+            value = pattern.sub(replacement, value)
+        return prefix + value
+
+    return read
+
+
+def compile_site(site_key, spec):
+    """
+    Build the parser of a site from its declarative spec. The returned function
+    takes the page HTML and returns a ParsedPage: the list of topic dicts
+    (title, topic_url, username, replies, last_activity) and the failure count.
+    """
+    rows_selector = spec['rows']
+    scope_selector = spec.get('scope')
+    readers = {name: _compile_field(spec['fields'][name]) for name in TOPIC_FIELDS}
+    date_format = spec['date_format']
+    if date_format not in DATE_FORMATS:
+        raise ValueError(f"Unknown date_format for site {site_key}: {date_format}")
+    required = tuple(spec.get('required', ('title', 'topic_url')))
+    skip_titles = frozenset(spec.get('skip_titles', ()))
+
+    def parse(html_content):
+        root = parse_html(html_content)
+        rows = root.select(rows_selector)
+        logger.debug("Found %s topic rows for site: %s", len(rows), site_key)
+
+        topics = []
+        failed = 0
+        for row in rows:
+            try:
+                if scope_selector:
+                    row = row.select_one(scope_selector)
+                    if row is None:
+                        continue
+
+                topic = {name: read(row) for name, read in readers.items()}
+
+                if topic['title'] in skip_titles:
+                    logger.debug("Skipping topic with title: %s", topic['title'])
+                    continue
+                if not all(topic[name] for name in required):
+                    continue
+
+                topic['replies'] = int(topic['replies'])
+                topics.append(topic)
+            except Exception as e:
+                logger.error("Failed to parse topic for site %s: %s", site_key, e)
+                failed += 1
+                continue
+
+        # Dates are converted in one batch, against a single "now"
+        normalizer = TimestampNormalizer()
+        epochs = normalizer.batch([topic['last_activity'] for topic in topics], date_format)
+        for topic, epoch in zip(topics, epochs):
+            topic['last_activity'] = epoch
+        if normalizer.failures:
+            logger.debug("%s unreadable dates for site: %s", normalizer.failures, site_key)
+
+        # Dropped rows, and kept rows whose date could not be read (stored as -1)
+        return ParsedPage(topics, failed + normalizer.failures)
+
+    return parse
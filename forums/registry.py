@@ -0,0 +1,21 @@
+from functools import lru_cache
+from sites import SITES_TO_SCRAPE
+
+# Parsers are compiled from sites.py on first use, so importing this module
+# does not pull in any HTML parsing library.
+
+
+@lru_cache(maxsize=None)
+def get_parser(site_key):
+    """
+    Return the parser of a site: a function taking the page HTML and returning
+    its topics and failure count (forums.extractor.ParsedPage).
+    Raises KeyError for a site missing from SITES_TO_SCRAPE.
+    """
+    from forums.extractor import compile_site
+    return compile_site(site_key, SITES_TO_SCRAPE[site_key])
+
+
+def parse(site_key, html_content):
+    """Parse a page of site_key"""
+    return get_parser(site_key)(html_content)
@@ -0,0 +1,225 @@
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import urlsplit
+import aiohttp
+import asyncio
+import logging
+import multiprocessing
+import threading
+import time
+
+from forums.registry import parse
+from sutils import setup_logging
+import smetrics
+from scraper import (
+    DEFAULT_HOST_INTERVAL, DEFAULT_SITE_CONCURRENCY, HTTP_HEADERS, PageResult,
+    _http_validators, _page_digests, _rate_limiter, page_digest, save_topics
+)
+
+logger = logging.getLogger(__name__)
+
+# Stage sizes. Fetches are I/O bound and overlap freely; parsing is CPU bound
+# and gets its own processes; there is exactly one database writer.
+FETCH_WORKERS = 16
+PARSE_WORKERS = 2
+QUEUE_SIZE = 32
+
+# Connections kept open to a single forum
+CONNECTIONS_PER_HOST = 4
+
+
+class FetchPipeline:
+    """
+    Asyncio pipeline for plain HTTP pages: fetch -> parse -> write.
+    The stages run on an event loop in a background thread and are linked by
+    bounded queues, so a slow stage applies backpressure instead of piling up
+    pages. Fetches share one aiohttp session with per-host connection pooling,
+    parsing runs in a process pool so it never blocks network I/O, and a single
+    writer task saves topics to the database.
+    """
+
+    def __init__(self, app, fetch_workers=FETCH_WORKERS, parse_workers=PARSE_WORKERS, queue_size=QUEUE_SIZE):
+        self.app = app
+        self.fetch_workers = fetch_workers
+        self.parse_workers = parse_workers
+        self.queue_size = queue_size
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='fetch-pipeline', daemon=True)
+        self._parse_pool = ProcessPoolExecutor(max_workers=parse_workers, mp_context=multiprocessing.get_context('spawn'),
+                                               initializer=setup_logging)
+        self._write_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='pipeline-writer')
+        self._site_limits = {}
+        self._tasks = []
+        # Futures handed out by submit() and not resolved yet; close() fails them
+        self._pending = set()
+        self._closing = False
+        self._lock = threading.Lock()
+
+    def start(self):
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._start(), self._loop).result()
+        logger.info("Fetch pipeline started")
+
+    def close(self):
+        with self._lock:
+            self._closing = True
+        asyncio.run_coroutine_threadsafe(self._stop(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._parse_pool.shutdown(cancel_futures=True)
+        self._write_pool.shutdown()
+        logger.info("Fetch pipeline stopped")
+
+    def submit(self, site_key, site_config, url):
+        """
+        Queue a page; returns a concurrent.futures.Future resolving to its PageResult.
+        Safe to call from any thread. Once the pipeline is closing, the page is
+        refused: the future is already resolved to a failed PageResult.
+        """
+        future = Future()
+        with self._lock:
+            if self._closing:
+                future.set_result(PageResult('failed', [], None))
+                return future
+            self._pending.add(future)
+        future.add_done_callback(self._forget)
+        asyncio.run_coroutine_threadsafe(self._fetch_queue.put((site_key, site_config, url, future)), self._loop)
+        return future
+
+    def _forget(self, future):
+        with self._lock:
+            self._pending.discard(future)
+
+    async def _start(self):
+        self._fetch_queue = asyncio.Queue(self.queue_size)
+        self._parse_queue = asyncio.Queue(self.queue_size)
+        self._write_queue = asyncio.Queue(self.queue_size)
+        self._session = aiohttp.ClientSession(
+            headers=HTTP_HEADERS,
+            timeout=aiohttp.ClientTimeout(total=10),
+            connector=aiohttp.TCPConnector(limit_per_host=CONNECTIONS_PER_HOST, ttl_dns_cache=300)
+        )
+        self._tasks = [asyncio.create_task(self._fetch_worker()) for _ in range(self.fetch_workers)]
+        self._tasks += [asyncio.create_task(self._parse_worker()) for _ in range(self.parse_workers)]
+        self._tasks.append(asyncio.create_task(self._writer()))
+
+    async def _stop(self):
+        # The stage workers, and the submit() puts still waiting for queue space
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self._session.close()
+
+        # Pages still queued, or held by a cancelled worker, would leave their
+        # submitters blocked on result() forever: fail them instead
+        for queue in (self._fetch_queue, self._parse_queue, self._write_queue):
+            while not queue.empty():
+                queue.get_nowait()
+                queue.task_done()
+        with self._lock:
+            pending = list(self._pending)
+        for future in pending:
+            if not future.done():
+                future.set_result(PageResult('failed', [], None))
+        if pending:
+            logger.info("Fetch pipeline closed with %s pages pending, marked failed", len(pending))
+
+    def _site_limit(self, site_key, site_config):
+        if site_key not in self._site_limits:
+            self._site_limits[site_key] = asyncio.Semaphore(site_config.get('max_concurrency', DEFAULT_SITE_CONCURRENCY))
+        return self._site_limits[site_key]
+
+    async def _fetch_worker(self):
+        while True:
+            site_key, site_config, url, future = await self._fetch_queue.get()
+            try:
+                async with self._site_limit(site_key, site_config):
+                    delay = _rate_limiter.reserve(urlsplit(url).netloc, site_config.get('min_interval', DEFAULT_HOST_INTERVAL))
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    html_content = await self._fetch(site_key, url)
+
+                if isinstance(html_content, PageResult):
+                    future.set_result(html_content)
+                    continue
+
+                digest = page_digest(html_content)
+                if _page_digests.get(url) == digest:
+                    logger.debug("Page body unchanged since last cycle, skipping: %s", url)
+                    future.set_result(PageResult('unchanged', [], None))
+                    continue
+
+                await self._parse_queue.put((site_key, url, html_content, digest, future))
+            except Exception as e:
+                logger.error("Fetch stage failed for %s: %s", url, e)
+                future.set_result(PageResult('failed', [], None))
+            finally:
+                self._fetch_queue.task_done()
+
+    async def _fetch(self, site_key, url):
+        """Return the page HTML, or a PageResult when there is nothing to parse"""
+        logger.debug("Scraping site: %s - URL: %s", site_key, url)
+
+        headers = {'Referer': url}
+        validators = _http_validators.get(url, {})
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+
+        start = time.perf_counter()
+        try:
+            async with self._session.get(url, headers=headers) as response:
+                if response.status == 304:
+                    logger.debug("Not modified since last cycle: %s", url)
+                    return PageResult('unchanged', [], None)
+                response.raise_for_status()
+                html_content = await response.text(errors='replace')
+                smetrics.stage_seconds.observe(time.perf_counter() - start, site=site_key, stage='page_load')
+                _http_validators[url] = {
+                    'etag': response.headers.get('ETag'),
+                    'last_modified': response.headers.get('Last-Modified')
+                }
+                return html_content
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error("Unable to scrape %s: %s", url, e)
+            return PageResult('failed', [], None)
+
+    async def _parse_worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            site_key, url, html_content, digest, future = await self._parse_queue.get()
+            try:
+                start = time.perf_counter()
+                topics, failed = await loop.run_in_executor(self._parse_pool, parse, site_key, html_content)
+                smetrics.stage_seconds.observe(time.perf_counter() - start, site=site_key, stage='parse')
+                # Counted here: the parse process has a registry of its own that nobody reads
+                smetrics.count_failed_topics(site_key, failed)
+                logger.debug("Parsed %s topics for site: %s - URL: %s", len(topics), site_key, url)
+                if topics:
+                    await self._write_queue.put((site_key, url, topics, digest, future))
+                else:
+                    future.set_result(PageResult('ok', [], None))
+            except Exception as e:
+                logger.error("Failed to parse HTML for site %s: %s", site_key, e)
+                future.set_result(PageResult('failed', [], None))
+            finally:
+                self._parse_queue.task_done()
+
+    async def _writer(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            site_key, url, topics, digest, future = await self._write_queue.get()
+            try:
+                counts = await loop.run_in_executor(self._write_pool, self._save, site_key, topics)
+                _page_digests[url] = digest
+                future.set_result(PageResult('ok', topics, counts))
+            except Exception as e:
+                logger.error("Failed to save topics for site %s: %s", site_key, e)
+                future.set_result(PageResult('failed', [], None))
+            finally:
+                self._write_queue.task_done()
+
+    def _save(self, site_key, topics):
+        with self.app.app_context():
+            return save_topics(site_key, topics)
@@ -1,2 +1,4 @@
 #!/bin/bash
-gunicorn -b 127.0.0.1:6000 --timeout 120 "app:create_app()"
\ No newline at end of file
+# Threaded workers: each /stream client holds a thread for as long as it stays connected,
+# up to sstream.MAX_STREAMS (FOROUM_MAX_STREAMS) of the 32; the rest serve the pages
+gunicorn -b 127.0.0.1:6000 --timeout 120 --worker-class gthread --threads 32 "app:create_app()"
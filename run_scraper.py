@@ -1,88 +1,214 @@
 from flask import Flask
-from scraper import scrape_site, scrape_site_with_selenium
-from db_manager import db
-import time
-from app import SITES_TO_SCRAPE
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
+from scraper import compact_topic_history, publish_homepage, scrape_site, use_pipeline
+from pipeline import FetchPipeline
+from db_manager import init_db, prepare_database
+from apscheduler.executors.pool import ThreadPoolExecutor
+from apscheduler.schedulers.background import BackgroundScheduler
+from datetime import datetime, timedelta
+import logging
+import os
 import threading
-from datetime import datetime
-
-def open_browser_session():
-    """Opens browser sessions for specific sites and keeps them open for 10 minutes"""
-    chrome_options = Options()
-    chrome_options.binary_location = "/usr/bin/google-chrome"
-    chrome_options.add_argument("--no-sandbox")
-    chrome_options.add_argument("--user-data-dir=/root/.config/google-chrome")
-    chrome_options.add_argument("--profile-directory=Default")
-    chrome_options.add_argument("--disable-popup-blocking")
-    
-    service = Service("/usr/local/bin/chromedriver")
-    
-    # Open browsers for each site
-    drivers = []
-    sites = ['https://avenoel.org', 'https://onche.org']
-    
-    for site in sites:
+import time
+from sites import SITES_TO_SCRAPE
+from browser_pool import browser_pool
+from sutils import setup_logging
+import smetrics
+
+logger = logging.getLogger(__name__)
+
+# Worker pools of the scheduler. Plain HTTP fetches are cheap, browser
+# fetches each hold a pooled Chrome session, so the two get separate bounds.
+HTTP_WORKERS = 4
+BROWSER_WORKERS = 4
+
+# Default scrape interval bounds, in seconds. Overridable per site with an
+# 'interval' entry in SITES_TO_SCRAPE: {'initial': ..., 'min': ..., 'max': ...}.
+DEFAULT_INTERVAL = 60
+MIN_INTERVAL = 15
+MAX_INTERVAL = 600
+
+# The scheduler aims for about this many new or updated topics per scrape of a site
+TARGET_CHANGES_PER_RUN = 5
+
+# Longest wait after repeated failures of a site, in seconds
+MAX_BACKOFF = 1800
+
+# How often the homepage snapshot is republished when something changed, in seconds
+SNAPSHOT_INTERVAL = 15
+
+# How often old topic history is downsampled, in seconds
+HISTORY_COMPACTION_INTERVAL = 3600
+
+# Port of the scraper's Prometheus listener on localhost, 0 to disable it. The
+# metrics are also dumped every METRICS_DUMP_INTERVAL seconds for the web app.
+METRICS_PORT = int(os.environ.get('FOROUM_METRICS_PORT', '9101'))
+METRICS_DUMP_INTERVAL = 15
+
+class SiteSchedule:
+    """
+    Adaptive scrape interval of one site. The interval follows the site's observed
+    churn (new + updated topics per second, smoothed) so that each scrape finds
+    roughly TARGET_CHANGES_PER_RUN changes, within the site's bounds, and moving at
+    most by a factor of 2 per run. Failed runs back off exponentially.
+    """
+
+    def __init__(self, site_key, site_config):
+        bounds = site_config.get('interval', {})
+        self.site_key = site_key
+        self.min_interval = bounds.get('min', MIN_INTERVAL)
+        self.max_interval = bounds.get('max', MAX_INTERVAL)
+        self.interval = bounds.get('initial', DEFAULT_INTERVAL)
+        self.churn = None
+        self.failures = 0
+        self.last_run = None
+
+    def record_success(self, changed):
+        now = time.monotonic()
+        elapsed = now - self.last_run if self.last_run is not None else self.interval
+        self.last_run = now
+        self.failures = 0
+
+        rate = changed / max(elapsed, 1)
+        self.churn = rate if self.churn is None else 0.5 * self.churn + 0.5 * rate
+
+        ideal = TARGET_CHANGES_PER_RUN / self.churn if self.churn > 0 else self.max_interval
+        ideal = min(max(ideal, self.interval / 2), self.interval * 2)
+        self.interval = min(max(ideal, self.min_interval), self.max_interval)
+
+    def record_failure(self):
+        self.last_run = time.monotonic()
+        self.failures += 1
+
+    def next_delay(self):
+        """Seconds until the next scrape of the site"""
+        if self.failures:
+            return min(self.interval * 2 ** self.failures, MAX_BACKOFF)
+        return self.interval
+
+class ScrapeScheduler:
+    """
+    Runs each site as its own APScheduler job, rescheduled after every run with
+    the delay given by its SiteSchedule. HTTP and browser sites run on separate
+    executors.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.schedules = {
+            site_key: SiteSchedule(site_key, site_config)
+            for site_key, site_config in SITES_TO_SCRAPE.items()
+        }
+        self._dirty = threading.Event()
+        self.scheduler = BackgroundScheduler(
+            executors={
+                'default': ThreadPoolExecutor(1),
+                'http': ThreadPoolExecutor(HTTP_WORKERS),
+                'browser': ThreadPoolExecutor(BROWSER_WORKERS)
+            },
+            job_defaults={'coalesce': True, 'max_instances': 1, 'misfire_grace_time': None}
+        )
+
+    def start(self):
+        for site_key in SITES_TO_SCRAPE:
+            self._schedule(site_key, 0)
+        self.scheduler.add_job(self.publish, 'interval', seconds=SNAPSHOT_INTERVAL, id='publish-homepage')
+        self.scheduler.add_job(self.compact_history, 'interval', seconds=HISTORY_COMPACTION_INTERVAL,
+                               id='compact-history', next_run_time=datetime.now())
+        self.scheduler.add_job(self.dump_metrics, 'interval', seconds=METRICS_DUMP_INTERVAL, id='dump-metrics')
+        self.scheduler.start()
+
+    def shutdown(self):
+        self.scheduler.shutdown(wait=False)
+
+    def _schedule(self, site_key, delay):
+        # One-off jobs: a site's next run is only scheduled once its current run is over,
+        # so a site never overlaps with itself even when a scrape outlasts its interval
+        executor = 'browser' if SITES_TO_SCRAPE[site_key]['fetch'] == 'selenium' else 'http'
+        self.scheduler.add_job(
+            self.run_site, 'date', run_date=datetime.now() + timedelta(seconds=delay),
+            args=[site_key], name=f'scrape-{site_key}', executor=executor
+        )
+
+    def run_site(self, site_key):
+        schedule = self.schedules[site_key]
         try:
-            driver = webdriver.Chrome(service=service, options=chrome_options)
-            # Allow redirects by configuring the driver
-            driver.execute_cdp_cmd('Page.setBypassCSP', {'enabled': True})
-            driver.get(site)
-            drivers.append(driver)
-            print(f"[INFO] Opened browser session for {site}")
+            with self.app.app_context():
+                counts = scrape_site(site_key, SITES_TO_SCRAPE[site_key])
+            scraped = counts['inserted'] + counts['updated'] + counts['unchanged']
+            if counts['failed'] and not scraped:
+                schedule.record_failure()
+            else:
+                changed = counts['inserted'] + counts['updated']
+                schedule.record_success(changed)
+                if changed:
+                    self._dirty.set()
         except Exception as e:
-            print(f"[ERROR] Failed to open browser for {site}: {e}")
-    
-    # Keep browsers open for 10 minutes
-    time.sleep(600)
-    
-    # Close all browsers
-    for driver in drivers:
+            logger.error("Scrape failed for site %s: %s", site_key, e)
+            schedule.record_failure()
+        finally:
+            delay = schedule.next_delay()
+            smetrics.next_scrape.set(delay, site=site_key)
+            logger.info("Next scrape of %s in %.0fs (churn %.3f/s, failures %s)",
+                        site_key, delay, schedule.churn or 0, schedule.failures)
+            self._schedule(site_key, delay)
+
+    def publish(self):
+        if not self._dirty.is_set():
+            return
+        self._dirty.clear()
         try:
-            driver.quit()
+            with self.app.app_context():
+                publish_homepage()
         except Exception as e:
-            print(f"[ERROR] Failed to close browser: {e}")
-    
-    print("[INFO] Closed all browser sessions")
+            self._dirty.set()
+            logger.error("Failed to publish homepage snapshot: %s", e)
+
+    def compact_history(self):
+        try:
+            with self.app.app_context():
+                compact_topic_history()
+        except Exception as e:
+            logger.error("Failed to compact topic history: %s", e)
+
+    def dump_metrics(self):
+        for event, value in browser_pool.stats().items():
+            if event != 'sessions':
+                smetrics.browser_pool_events.set(value, event=event)
+        try:
+            smetrics.scraper_registry.dump(smetrics.SCRAPER_METRICS_FILE)
+        except OSError as e:
+            logger.error("Failed to write scraper metrics: %s", e)
 
 def run_scraper():
     app = Flask(__name__)
-    
-    # Configure the database
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///db/scraped_data.db'
-    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-    db.init_app(app)
+    prepare_database()
+    init_db(app)
+
+    # Plain HTTP sites are fetched, parsed and saved by the asyncio pipeline
+    pipeline = FetchPipeline(app)
+    pipeline.start()
+    use_pipeline(pipeline)
 
-    # Track when we last opened browser sessions
-    last_browser_session = datetime.now()
+    if METRICS_PORT:
+        smetrics.start_http_server(smetrics.scraper_registry, METRICS_PORT)
+        logger.info("Serving scraper metrics on http://127.0.0.1:%s/metrics", METRICS_PORT)
 
-    with app.app_context():
+    scheduler = ScrapeScheduler(app)
+    scheduler.start()
+    try:
         while True:
-            print("[INFO] Starting scrape cycle...")
-            
-            # Check if an hour has passed since last browser session
-            current_time = datetime.now()
-            if (current_time - last_browser_session).total_seconds() >= 3600:  # 1 hour = 3600 seconds
-                print("[INFO] Starting browser sessions")
-                # Start browser sessions in a separate thread
-                browser_thread = threading.Thread(target=open_browser_session)
-                browser_thread.start()
-                last_browser_session = current_time
-            
-            for site_key, site_config in SITES_TO_SCRAPE.items():
-                if site_key in ['jeuxvideo', '2sucres', 'onche', 'avenoel']:
-                    print(f"[INFO] Using Selenium for site: {site_key}")
-                    scrape_site_with_selenium(site_key, site_config)
-                else:
-                    print(f"[INFO] Using scrap for site: {site_key}")
-                    scrape_site(site_key, site_config)
-            print("[INFO] Scrape cycle completed. Waiting 60 seconds...")
             time.sleep(60)
+            logger.info("Browser pool stats: %s", browser_pool.stats())
+    finally:
+        scheduler.shutdown()
+        use_pipeline(None)
+        pipeline.close()
 
 if __name__ == '__main__':
+    setup_logging()
     try:
         run_scraper()
     except KeyboardInterrupt:
-        print("[INFO] Scraper process stopped")
\ No newline at end of file
+        logger.info("Scraper process stopped")
+    finally:
+        browser_pool.close()
@@ -1,189 +1,426 @@
 import requests
+from requests.adapters import HTTPAdapter
 from sqlalchemy import func
-from datetime import datetime, timezone
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
+from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from db_manager import db, Topic
+from db_manager import compact_history, prune_changes, publish_snapshot, upsert_topics
+from browser_pool import browser_pool
+import smetrics
+import hashlib
+import logging
+from collections import namedtuple
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from urllib.parse import urlsplit
 
-from forums.jeuxvideo import parse_jeuxvideo
-from forums.village import parse_village
-from forums.avenoel import parse_avenoel
-from forums.onche import parse_onche
-from forums.sucres import parse_2sucres
+from forums.registry import get_parser
 
-def scrape_site(site_key, site_config):
+logger = logging.getLogger(__name__)
+
+# Scrape workers run concurrently; SQLite only tolerates one writer at a time,
+# so every batch write to the topic table goes through this lock.
+_db_lock = threading.Lock()
+
+# Upper bound on how long a browser page may take to become ready
+DEFAULT_READY_TIMEOUT = 20
+
+# Default number of concurrent fetches allowed against the same site.
+# Overridable per site with a 'max_concurrency' entry in SITES_TO_SCRAPE.
+DEFAULT_SITE_CONCURRENCY = 1
+
+# Headers sent with every plain HTTP fetch
+HTTP_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.9',
+    'Accept-Encoding': 'gzip, deflate, br',
+    'Connection': 'keep-alive',
+    'DNT': '1',
+    'Upgrade-Insecure-Requests': '1'
+}
+
+# Returned by a fetcher when the page is known not to have changed since the last cycle
+NOT_MODIFIED = object()
+
+# Outcome of one page: status is 'ok', 'unchanged' or 'failed'; counts is None
+# when nothing was saved
+PageResult = namedtuple('PageResult', ['status', 'topics', 'counts'])
+
+# One keep-alive session per host, and the ETag/Last-Modified validators per URL
+_http_sessions = {}
+_http_sessions_lock = threading.Lock()
+_http_validators = {}
+
+# Hash of the last body parsed per URL, to skip pages that did not change
+_page_digests = {}
+
+# Default minimum delay between two requests to the same host, in seconds.
+# Overridable per site with a 'min_interval' entry in SITES_TO_SCRAPE.
+DEFAULT_HOST_INTERVAL = 1.0
+
+
+def save_topics(site_key, topics):
     """
-    Fetch a site and parse its content according to the site's configuration.
+    Insert or update the parsed topics of a site. Safe to call from several worker threads.
     """
-    url = site_config['url']
-    parser_func_name = site_config['parser']
+    with _db_lock, smetrics.stage_seconds.time(site=site_key, stage='db_write'):
+        counts = upsert_topics(site_key, topics)
+    smetrics.count_topics(site_key, counts)
+    logger.debug("Finished saving topics for site: %s - %s inserted, %s updated, %s unchanged",
+                 site_key, counts['inserted'], counts['updated'], counts['unchanged'])
+    return counts
 
-    print(f"[DEBUG] Scraping site: {site_key} - URL: {url}")
 
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-        'Accept-Language': 'en-US,en;q=0.9',
-        'Accept-Encoding': 'gzip, deflate, br',
-        'Connection': 'keep-alive',
-        'Referer': url,
-        'DNT': '1',
-        'Upgrade-Insecure-Requests': '1',
-        'Cache-Control': 'no-cache',
-        'Pragma': 'no-cache'
-    }
+def publish_homepage():
+    """
+    Publish the homepage snapshot for the web app and trim the change log behind
+    the live feed. Called at the end of a scrape cycle.
+    """
+    with _db_lock, smetrics.stage_seconds.time(site='all', stage='snapshot_publish'):
+        version = publish_snapshot()
+        prune_changes()
+    logger.info("Published homepage snapshot version %s", version)
+    return version
+
+
+def compact_topic_history():
+    """Downsample and expire old reply count history"""
+    with _db_lock:
+        deleted = compact_history()
+    logger.info("Compacted topic history, %s points removed", deleted)
+    return deleted
+
+
+class network_idle:
+    """
+    Expected condition: the document has loaded and no new resource requests
+    were started during the last `idle_seconds`.
+    """
+
+    def __init__(self, idle_seconds=0.5):
+        self.idle_seconds = idle_seconds
+        self._last_count = -1
+        self._stable_since = None
+
+    def __call__(self, driver):
+        ready_state, count = driver.execute_script(
+            "return [document.readyState, performance.getEntriesByType('resource').length];"
+        )
+        if ready_state != 'complete':
+            return False
+        now = time.monotonic()
+        if count != self._last_count:
+            self._last_count = count
+            self._stable_since = now
+            return False
+        return now - self._stable_since >= self.idle_seconds
+
+
+class min_elements_present:
+    """Expected condition: at least `min_count` elements match `selector`"""
+
+    def __init__(self, selector, min_count=1):
+        self.selector = selector
+        self.min_count = min_count
+
+    def __call__(self, driver):
+        return len(driver.find_elements(By.CSS_SELECTOR, self.selector)) >= self.min_count
 
+
+def wait_until_ready(driver, ready, timeout=None):
+    """
+    Block until the page described by a site's 'ready' config can be harvested,
+    for at most `timeout` seconds (default: the config's own timeout).
+    On timeout the page is harvested anyway, the parser copes with partial content.
+    """
+    if timeout is None:
+        timeout = ready.get('timeout', DEFAULT_READY_TIMEOUT)
+    if ready.get('network_idle'):
+        condition = network_idle(ready.get('idle_seconds', 0.5))
+    elif 'selector' in ready:
+        condition = min_elements_present(ready['selector'], ready.get('min_count', 1))
+    else:
+        condition = lambda d: d.execute_script("return document.readyState;") == 'complete'
+
+    start = time.monotonic()
     try:
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
+        WebDriverWait(driver, timeout, poll_frequency=0.2).until(condition)
+        logger.debug("Page ready after %.2fs", time.monotonic() - start)
+    except TimeoutException:
+        logger.warning("Page not ready after %ss, harvesting what is loaded", timeout)
+
+
+def load_page(driver, url, timeout):
+    """
+    Navigate to url, giving up on the load after `timeout` seconds. A page still
+    loading then is stopped and kept: the topic list is often there already.
+    """
+    # The driver is shared by the sites of a profile, each with its own timeout
+    driver.set_page_load_timeout(timeout)
+    try:
+        driver.get(url)
+    except TimeoutException:
+        logger.warning("Page load not finished after %ss, stopping it: %s", timeout, url)
+        driver.execute_script("window.stop();")
+
+
+def _http_session(host):
+    """Return the keep-alive session of a host, creating it on first use"""
+    with _http_sessions_lock:
+        session = _http_sessions.get(host)
+        if session is None:
+            session = requests.Session()
+            session.headers.update(HTTP_HEADERS)
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=4)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _http_sessions[host] = session
+        return session
 
-        # Get the content encoding from headers
-        content_encoding = response.headers.get('Content-Encoding', '').lower()
-        print(f"[DEBUG] Content-Encoding: {content_encoding}")
-
-        if 'br' in content_encoding:
-            print("[DEBUG] Decompressing Brotli response")
-            try:
-                import brotli
-                response_text = brotli.decompress(response.content).decode('utf-8')
-            except Exception as e:
-                print(f"[ERROR] Brotli decompression failed, trying raw content: {e}")
-                response_text = response.content.decode('utf-8', errors='replace')
-        elif 'gzip' in content_encoding:
-            print("[DEBUG] Decompressing GZIP response")
-            response_text = response.text  # requests automatically handles gzip
-        else:
-            print("[DEBUG] No decompression needed")
-            response_text = response.text
-
-        print(f"[DEBUG] Response status: {response.status_code}")
-        print(f"[DEBUG] Response headers: {dict(response.headers)}")
 
+def fetch_http(site_key, site_config, url):
+    """
+    Fetch a page over plain HTTP and return its HTML, NOT_MODIFIED if the server
+    confirmed our cached validators, or None if the request failed.
+    """
+    logger.debug("Scraping site: %s - URL: %s", site_key, url)
+
+    headers = {'Referer': url}
+    validators = _http_validators.get(url, {})
+    if validators.get('etag'):
+        headers['If-None-Match'] = validators['etag']
+    if validators.get('last_modified'):
+        headers['If-Modified-Since'] = validators['last_modified']
+
+    try:
+        # requests/urllib3 transparently decode gzip and, with brotli installed, br
+        with smetrics.stage_seconds.time(site=site_key, stage='page_load'):
+            response = _http_session(urlsplit(url).netloc).get(url, headers=headers, timeout=10)
+        if response.status_code == 304:
+            logger.debug("Not modified since last cycle: %s", url)
+            return NOT_MODIFIED
+        response.raise_for_status()
     except requests.RequestException as e:
-        print(f"[ERROR] Unable to scrape {url}: {e}")
-        return
+        logger.error("Unable to scrape %s: %s", url, e)
+        return None
+
+    _http_validators[url] = {
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified')
+    }
+    logger.debug("Response status: %s", response.status_code)
+    return response.text
+
+
+def fetch_with_selenium(site_key, site_config, url):
+    """
+    Load a page in the site's pooled browser tab and return its HTML, or None if loading failed.
+    """
+    logger.debug("Scraping site with Selenium: %s - URL: %s", site_key, url)
+
+    # Each site gets its own long-lived browser profile unless it names one to share
+    profile = site_config.get('profile', site_key)
 
-    parser_func = globals().get(parser_func_name)
-    if not parser_func:
-        print(f"[ERROR] Parser function '{parser_func_name}' not found.")
-        return
+    try:
+        start = time.perf_counter()
+        with browser_pool.tab(profile, site_key) as driver:
+            smetrics.stage_seconds.observe(time.perf_counter() - start, site=site_key, stage='browser_acquire')
+            # Load the page and harvest it as soon as the topic list is there
+            with smetrics.stage_seconds.time(site=site_key, stage='page_load'):
+                ready = dict({'selector': site_config['rows']}, **site_config.get('ready', {}))
+                timeout = ready.get('timeout', DEFAULT_READY_TIMEOUT)
+                deadline = time.monotonic() + timeout
+                load_page(driver, url, timeout)
+                wait_until_ready(driver, ready, max(deadline - time.monotonic(), 0))
+                return driver.page_source
+    except Exception as e:
+        logger.error("Failed to scrape %s with Selenium: %s", url, e)
+        return None
+
+
+FETCHERS = {
+    'http': fetch_http,
+    'selenium': fetch_with_selenium
+}
+
+
+class HostRateLimiter:
+    """
+    Spaces out requests to the same host by at least a minimum interval.
+    Each caller reserves the next free slot, then sleeps until it comes.
+    """
+
+    def __init__(self):
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def reserve(self, host, min_interval):
+        """Reserve the next free slot for host and return how long to wait for it"""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + min_interval
+        return slot - now
+
+    def wait(self, host, min_interval):
+        delay = self.reserve(host, min_interval)
+        if delay > 0:
+            time.sleep(delay)
+
+
+_rate_limiter = HostRateLimiter()
+
+# Concurrent fetches allowed per site, created from the site's 'max_concurrency'
+_site_limits = {}
+_site_limits_lock = threading.Lock()
+
+# Newest last_activity seen per board during the previous cycle
+_high_water = {}
+
+# Set by use_pipeline() when the scraper runs the asyncio fetch pipeline
+_pipeline = None
+
+# Boards of a multi-board site are crawled in parallel on this pool
+_board_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='scrape-board')
+
+
+def _site_limit(site_key, site_config):
+    with _site_limits_lock:
+        if site_key not in _site_limits:
+            _site_limits[site_key] = threading.BoundedSemaphore(site_config.get('max_concurrency', DEFAULT_SITE_CONCURRENCY))
+        return _site_limits[site_key]
+
+
+def site_boards(site_config):
+    """
+    Return the boards of a site. Without a 'boards' entry the site is a single
+    board: the first page of its 'url'.
+    """
+    return site_config.get('boards', [{'url': site_config['url'], 'pages': 1}])
+
+
+def board_page_urls(board):
+    """
+    URLs of the pages of a board, first page first. Board URLs may use {page}
+    (1, 2, 3...) or {offset}, the index of the first topic of the page
+    (1, 1 + page_size, ...), as JVC does.
+    """
+    page_size = board.get('page_size', 25)
+    return [
+        board['url'].format(page=page, offset=1 + (page - 1) * page_size)
+        for page in range(1, board.get('pages', 1) + 1)
+    ]
+
+
+def use_pipeline(pipeline):
+    """Route the pages of plain HTTP sites through an asyncio FetchPipeline"""
+    global _pipeline
+    _pipeline = pipeline
+
+
+def process_page(site_key, site_config, url):
+    """
+    Fetch, parse and save one page synchronously. Plain HTTP pages go through the
+    fetch pipeline instead when one is running.
+    Returns a PageResult.
+    """
+    if _pipeline is not None and site_config['fetch'] == 'http':
+        return _pipeline.submit(site_key, site_config, url).result()
+
+    with _site_limit(site_key, site_config):
+        _rate_limiter.wait(urlsplit(url).netloc, site_config.get('min_interval', DEFAULT_HOST_INTERVAL))
+        html_content = FETCHERS[site_config['fetch']](site_key, site_config, url)
+    if html_content is None:
+        return PageResult('failed', [], None)
+    if html_content is NOT_MODIFIED:
+        return PageResult('unchanged', [], None)
+
+    digest = page_digest(html_content)
+    if _page_digests.get(url) == digest:
+        logger.debug("Page body unchanged since last cycle, skipping: %s", url)
+        return PageResult('unchanged', [], None)
 
     # Parse the HTML content
     try:
-        topics = parser_func(response_text)  # Use HTML content for other sites
+        with smetrics.stage_seconds.time(site=site_key, stage='parse'):
+            topics, failed = get_parser(site_key)(html_content)
     except Exception as e:
-        print(f"[ERROR] Failed to parse HTML for site {site_key}: {e}")
-        return
+        logger.error("Failed to parse HTML for site %s: %s", site_key, e)
+        return PageResult('failed', [], None)
+    smetrics.count_failed_topics(site_key, failed)
 
-    print(f"[DEBUG] Parsed {len(topics)} topics for site: {site_key}")
+    logger.debug("Parsed %s topics for site: %s - URL: %s", len(topics), site_key, url)
+    if not topics:
+        return PageResult('ok', [], None)
 
     # Save topics to the database
-    for topic in topics:
-        print(f"[DEBUG] Processing topic: {topic['title']} - URL: {topic['topic_url']}")
-        existing_topic = Topic.query.filter_by(topic_url=topic['topic_url']).first()
-        if not existing_topic:
-            new_topic = Topic(
-                site_key=site_key,
-                title=topic['title'],
-                topic_url=topic['topic_url'],
-                username=topic['username'],
-                replies=int(topic['replies']),
-                last_activity=topic['last_activity'],
-                timestamp=datetime.now(timezone.utc)  # Use timezone-aware UTC datetime
-            )
-            db.session.add(new_topic)
-        else:
-            # Update existing topic if needed
-            existing_topic.title = topic['title']
-            existing_topic.username = topic['username']
-            existing_topic.replies = int(topic['replies'])
-            existing_topic.last_activity = topic['last_activity']
-            existing_topic.timestamp = datetime.now(timezone.utc)
-            db.session.add(existing_topic)
-            print(f"[DEBUG] Topic already exists in the database: {topic['topic_url']}")
-    db.session.commit()
-    print(f"[DEBUG] Finished saving topics for site: {site_key}")
-
-
-def scrape_site_with_selenium(site_key, site_config):
-    """
-    Fetch a site using Selenium and parse its content according to the site's configuration.
-    """
-    url = site_config['url']
-    parser_func_name = site_config['parser']
-
-    print(f"[DEBUG] Scraping site with Selenium: {site_key} - URL: {url}")
-
-    # Configure Selenium WebDriver for containerized environment
-    chrome_options = Options()
-
-    # Container-specific Chrome options
-    chrome_options.binary_location = "/usr/bin/google-chrome"
-    #chrome_options.add_argument("--headless")
-    chrome_options.add_argument("--no-sandbox")
-    chrome_options.add_argument("--user-data-dir=/root/.config/google-chrome")
-    chrome_options.add_argument("--profile-directory=Default")
-
-    # Use the ChromeDriver installed in the container
-    service = Service("/usr/local/bin/chromedriver")
-    driver = webdriver.Chrome(service=service, options=chrome_options)
+    counts = save_topics(site_key, topics)
+    _page_digests[url] = digest
+    return PageResult('ok', topics, counts)
 
-    try:
-        # Load the page
-        driver.get(url)
 
-        time.sleep(10)
-
-        # Wait for the JavaScript-rendered content to load (if applicable)
-        if site_key == '2sucres':
-            WebDriverWait(driver, 30).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, "div.tbody > div > div.tr"))
-            )
-
-        # Get the page source and parse it with BeautifulSoup
-        html_content = driver.page_source
-        parser_func = globals().get(parser_func_name)
-        if not parser_func:
-            print(f"[ERROR] Parser function '{parser_func_name}' not found.")
-            return
-
-        topics = parser_func(html_content)
-        print(f"[DEBUG] Parsed {len(topics)} topics for site: {site_key}")
-
-        # Save topics to the database
-        for topic in topics:
-            print(f"[DEBUG] Processing topic: {topic['title']} - URL: {topic['topic_url']}")
-            existing_topic = Topic.query.filter_by(topic_url=topic['topic_url']).first()
-            if not existing_topic:
-                new_topic = Topic(
-                    site_key=site_key,
-                    title=topic['title'],
-                    topic_url=topic['topic_url'],
-                    username=topic['username'],
-                    replies=int(topic['replies']),
-                    last_activity=topic['last_activity'],
-                    timestamp=datetime.now(timezone.utc)  # Use timezone-aware UTC datetime
-                )
-                db.session.add(new_topic)
-            else:
-                print(f"[DEBUG] Topic already exists in the database: {topic['topic_url']}")
-                # Update existing topic if needed
-                existing_topic.title = topic['title']
-                existing_topic.username = topic['username']
-                existing_topic.replies = int(topic['replies'])
-                existing_topic.last_activity = topic['last_activity']
-                existing_topic.timestamp = datetime.now(timezone.utc)
-                db.session.add(existing_topic)
-
-        db.session.commit()
-        print(f"[DEBUG] Finished saving topics for site: {site_key}")
+def page_digest(html_content):
+    return hashlib.sha1(html_content.encode('utf-8')).hexdigest()
 
-    except Exception as e:
-        print(f"[ERROR] Failed to scrape {url} with Selenium: {e}")
-    finally:
-        driver.quit()
+
+def crawl_board(site_key, site_config, board):
+    """
+    Scrape the pages of one board in order, stopping at the first page that did not
+    change since the last cycle, or whose topics are all older than the newest topic
+    seen on this board by the previous cycle: nothing further down changed either.
+    Returns the inserted/updated/unchanged topic counts of the board, plus the
+    number of pages that failed to load or parse.
+    """
+    high_water_key = (site_key, board['url'])
+    high_water = _high_water.get(high_water_key)
+    newest = None
+    totals = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'failed': 0}
+
+    for page, url in enumerate(board_page_urls(board), 1):
+        result = process_page(site_key, site_config, url)
+        smetrics.pages.inc(site=site_key, status=result.status)
+        smetrics.topics.inc(len(result.topics), site=site_key, outcome='parsed')
+        if result.status == 'failed':
+            totals['failed'] += 1
+        if result.status != 'ok' or not result.topics:
+            break
+
+        for key in result.counts:
+            totals[key] += result.counts[key]
+
+        activities = [topic['last_activity'] for topic in result.topics if topic['last_activity'] and topic['last_activity'] > 0]
+        if activities:
+            newest = max(newest or 0, max(activities))
+            if high_water is not None and max(activities) <= high_water:
+                logger.debug("Page %s of %s holds nothing newer than the last cycle, stopping", page, board['url'])
+                break
+
+    if newest is not None:
+        _high_water[high_water_key] = newest
+    return totals
+
+
+def scrape_site(site_key, site_config):
+    """
+    Scrape every board of a site according to the site's configuration, boards in
+    parallel. Must be called inside an app context.
+    Returns the inserted/updated/unchanged/failed counts of the whole site.
+    """
+    boards = site_boards(site_config)
+    if len(boards) == 1:
+        return crawl_board(site_key, site_config, boards[0])
+
+    app = current_app._get_current_object()
+
+    def crawl_in_context(board):
+        with app.app_context():
+            return crawl_board(site_key, site_config, board)
+
+    totals = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'failed': 0}
+    for counts in _board_executor.map(crawl_in_context, boards):
+        for key in totals:
+            totals[key] += counts[key]
+    return totals
@@ -0,0 +1,174 @@
+import os
+
+# Declarative definition of every scraped forum. Adding a forum is a new entry
+# here; forums/extractor.py turns the entry into a parser. This module is plain
+# data so the web app can read it without importing any scraping dependency.
+#
+# Keys of a site entry:
+#   url            page listing the latest topics
+#   boards         optional list of boards to crawl instead of just 'url': each has a
+#                  'url' (with {page} or {offset} placeholders), a 'pages' depth limit
+#                  and, for {offset}, a 'page_size'. Crawling a board stops early once
+#                  a page holds nothing newer than what the previous cycle saw
+#   fetch          'http' (plain request) or 'selenium' (pooled Chrome tab)
+#   favicon        icon shown next to the site's topics on the homepage
+#   rows           CSS selector of one topic row
+#   scope          optional selector inside a row; rows without it are skipped and
+#                  the field selectors are then relative to it
+#   fields         how to read title, topic_url, username, replies and last_activity:
+#                    selector   CSS selector relative to the row (or scope);
+#                               omitted means the row/scope element itself
+#                    attr       attribute to read instead of the text
+#                    parent     read the parent of the matched element
+#                    sub        (regex, replacement) applied to the value
+#                    prefix     prepended to the value (relative URLs)
+#                    default    value when the element is missing
+#   date_format    'absolute' (dates and times) or 'relative' ("5m", "2h"), see
+#                  sutils.TimestampNormalizer
+#   required       fields a row must have to be kept (default: title and topic_url)
+#   skip_titles    pinned/moderation topics to ignore
+#   ready          Selenium readiness: 'selector' (defaults to rows) with 'min_count',
+#                  or 'network_idle': True, plus a 'timeout' in seconds
+#   profile        browser profile to share with other sites (default: own profile).
+#                  'Default' is the historical /root/.config/google-chrome data dir,
+#                  whose cookies and clearance onche and avenoel rely on
+#   max_concurrency  concurrent fetches allowed against the site (default 1)
+#   min_interval   minimum delay between two requests to the site's host (default 1s)
+#   interval       bounds of the adaptive scrape interval in seconds:
+#                  {'initial': 60, 'min': 15, 'max': 600} by default
+SITES_TO_SCRAPE = {
+    'onche': {
+        'url': 'https://onche.org/forum/1/blabla-general',
+        'fetch': 'selenium',
+        'profile': 'Default',
+        'favicon': 'https://onche.org/favicon.ico',
+        'rows': 'div.topic',
+        'fields': {
+            'title': {'selector': 'a.topic-subject.link span'},
+            'topic_url': {'selector': 'a.topic-subject.link', 'attr': 'href'},
+            'username': {'selector': 'div.topic-username'},
+            'replies': {'selector': 'span.topic-nb', 'default': '0'},
+            'last_activity': {'selector': 'a.right span'}
+        },
+        'date_format': 'relative',
+        'skip_titles': ["Topic de la modération", "[À LIRE] Règles du forum"],
+        'ready': {'min_count': 10, 'timeout': 20}
+    },
+    'avenoel': {
+        'url': 'https://avenoel.org/forum',
+        'fetch': 'selenium',
+        'profile': 'Default',
+        'favicon': 'https://avenoel.org/favicon.ico',
+        'rows': 'tr',
+        'fields': {
+            # Titles end with the page count, e.g. "Mon topic (3)"
+            'title': {'selector': 'td.topics-title a', 'sub': (r'\s*\([^()]*\)$', '')},
+            'topic_url': {'selector': 'td.topics-title a', 'attr': 'href'},
+            'username': {'selector': 'td.topics-author a'},
+            'replies': {'selector': 'td.topics-amount', 'default': '0'},
+            'last_activity': {'selector': 'td.topics-date'}
+        },
+        'date_format': 'absolute',
+        'skip_titles': ["Topic de modération", "🟣 Discord d'AVN (nouveau lien)"],
+        'ready': {'selector': 'td.topics-title a', 'min_count': 10, 'timeout': 20}
+    },
+    'village': {
+        'url': 'https://village.cx/village',
+        'fetch': 'http',
+        'interval': {'initial': 120, 'min': 60, 'max': 900},
+        'favicon': 'https://village.cx/village.png',
+        'rows': 'div.row-center.bg-base-0',
+        'scope': 'a[href^="/village/"].row-center',
+        'fields': {
+            'title': {'selector': 'div span.font-medium span.topic-title', 'default': ''},
+            'topic_url': {'attr': 'href', 'prefix': 'https://village.cx'},
+            'username': {'selector': 'span.row-center.text-sm span', 'default': 'Unknown'},
+            'replies': {'selector': 'div span.font-medium span.text-sm i.far.fa-message-lines', 'parent': True, 'default': '0'},
+            'last_activity': {'selector': 'span.ml-auto.mr-2', 'sub': (r'\s+', '')}
+        },
+        'date_format': 'relative',
+        'required': ['topic_url'],
+        'skip_titles': []
+    },
+    'jeuxvideo': {
+        'url': 'https://www.jeuxvideo.com/forums/0-51-0-1-0-1-0-blabla-18-25-ans.htm',
+        'boards': [
+            {'url': 'https://www.jeuxvideo.com/forums/0-51-0-1-0-{offset}-0-blabla-18-25-ans.htm', 'pages': 3, 'page_size': 25}
+        ],
+        'fetch': 'selenium',
+        'interval': {'initial': 30, 'min': 15, 'max': 300},
+        'favicon': 'https://www.jeuxvideo.com/favicon.png',
+        'rows': 'ul.topic-list > li[data-id]',
+        'fields': {
+            'title': {'selector': 'a.topic-title'},
+            'topic_url': {'selector': 'a.topic-title', 'attr': 'href', 'prefix': 'https://www.jeuxvideo.com'},
+            'username': {'selector': 'a.topic-author'},
+            'replies': {'selector': 'span.topic-count', 'default': '0'},
+            'last_activity': {'selector': 'span.topic-date a'}
+        },
+        'date_format': 'absolute',
+        'skip_titles': ["Modération ultime= pas nous", "Règles du forum"],
+        'ready': {'min_count': 10, 'timeout': 20}
+    },
+    '2sucres': {
+        'url': 'https://2sucres.org/forums/1/1',
+        'boards': [
+            {'url': 'https://2sucres.org/forums/1/{page}', 'pages': 3}
+        ],
+        'fetch': 'selenium',
+        'favicon': '/static/img/2sucres.ico',
+        'rows': 'div.tbody > div > div.tr',
+        'fields': {
+            'title': {'selector': 'div.topicName a'},
+            'topic_url': {'selector': 'div.topicName a', 'attr': 'href', 'prefix': 'https://2sucres.org'},
+            'username': {'selector': 'div.topicAuteur a'},
+            'replies': {'selector': 'div.topicNb', 'default': '0'},
+            'last_activity': {'selector': 'div.topicDernier a'}
+        },
+        'date_format': 'absolute',
+        'skip_titles': [
+            "Les bugs / éléments inconvenants sur 2Sucres",
+            "[OFFICIEL] Bienvenue aux NOUVEAUX ! + TUTO",
+            "Secrétariat de 2S (Modération/Administration)",
+            "Feuille de route du développement de 2Sucres"
+        ],
+        'ready': {'min_count': 5, 'timeout': 30}
+    }
+}
+
+# Load testing against benchmarks/fake_forum.py: FOROUM_SITES_BASE_URL points every
+# site at <base>/<site_key>/<page>, FOROUM_SITES_FETCH forces a fetch method, and
+# FOROUM_SITES_MIN_INTERVAL replaces the per-host delay (0 by default, as every
+# site then shares one host).
+def _local_override(sites, base_url, fetch=None, min_interval=0.0):
+    """Rewrite the site entries to scrape a local fake forum instead of the real ones"""
+    base_url = base_url.rstrip('/')
+    overridden = {}
+    for site_key, site in sites.items():
+        site = dict(site, url=f'{base_url}/{site_key}/1', min_interval=min_interval)
+        if 'boards' in site:
+            site['boards'] = [
+                {'url': f'{base_url}/{site_key}/{{page}}', 'pages': board.get('pages', 1)}
+                for board in site['boards']
+            ]
+        # Relative topic links get the fake forum's host instead of the real one
+        site['fields'] = {
+            name: dict(field, prefix=f'{base_url}/{site_key}') if field.get('prefix') else field
+            for name, field in site['fields'].items()
+        }
+        if fetch:
+            site['fetch'] = fetch
+        overridden[site_key] = site
+    return overridden
+
+if os.environ.get('FOROUM_SITES_BASE_URL'):
+    SITES_TO_SCRAPE = _local_override(
+        SITES_TO_SCRAPE,
+        os.environ['FOROUM_SITES_BASE_URL'],
+        fetch=os.environ.get('FOROUM_SITES_FETCH'),
+        min_interval=float(os.environ.get('FOROUM_SITES_MIN_INTERVAL', '0'))
+    )
+
+def site_favicons():
+    """Map each site_key to its favicon URL, for the templates"""
+    return {site_key: site.get('favicon') for site_key, site in SITES_TO_SCRAPE.items()}
@@ -0,0 +1,201 @@
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import os
+import threading
+import time
+
+# Metrics in the Prometheus text format, without a client library. The scraper
+# and the web app each fill their own registry. The scraper serves its registry
+# on a small HTTP listener and also dumps it to SCRAPER_METRICS_FILE, which the
+# web app's /metrics appends to its own metrics, so one scrape target shows both.
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+SCRAPER_METRICS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'db', 'scraper_metrics.prom')
+
+# Buckets of the stage timers, in seconds: from a fast parse to a slow browser load
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+class Counter:
+    """Monotonic counter, one value per label set"""
+    kind = 'counter'
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple((name, labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        return [(self.name, labels, value) for labels, value in sorted(values.items())]
+
+
+class Gauge(Counter):
+    """Value that goes up and down, set from the latest reading"""
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = tuple((name, labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram:
+    """Durations with cumulative buckets, a sum and a count, one series per label set"""
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=STAGE_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple((name, labels[name]) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            series = {key: ([*counts], total, count) for key, (counts, total, count) in self._series.items()}
+        samples = []
+        for labels, (counts, total, count) in sorted(series.items()):
+            for bound, bucket_count in zip(self.buckets, counts):
+                samples.append((self.name + '_bucket', labels + (('le', repr(float(bound))),), bucket_count))
+            samples.append((self.name + '_bucket', labels + (('le', '+Inf'),), count))
+            samples.append((self.name + '_sum', labels, total))
+            samples.append((self.name + '_count', labels, count))
+        return samples
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Every metric of the registry in the Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{_format_labels(labels)} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def dump(self, path):
+        """Write render() to path, atomically so readers never see half a file"""
+        temporary = f'{path}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as f:
+            f.write(self.render())
+        os.replace(temporary, path)
+
+
+scraper_registry = Registry()
+web_registry = Registry()
+
+# Scraper metrics. Stages: browser_acquire, page_load, parse, db_write and
+# snapshot_publish (the latter with site="all", it is not per site). Failed topics
+# are rows the parser dropped on an error plus rows whose date could not be read.
+stage_seconds = scraper_registry.register(Histogram(
+    'foroum_scraper_stage_seconds', 'Time spent per site and scrape stage', ('site', 'stage')))
+pages = scraper_registry.register(Counter(
+    'foroum_scraper_pages_total', 'Pages processed per site, by outcome (ok, unchanged, failed)', ('site', 'status')))
+topics = scraper_registry.register(Counter(
+    'foroum_scraper_topics_total', 'Topics per site, by outcome (parsed, inserted, updated, unchanged, failed)', ('site', 'outcome')))
+next_scrape = scraper_registry.register(Gauge(
+    'foroum_scraper_next_scrape_seconds', 'Delay until the next scrape of each site', ('site',)))
+browser_pool_events = scraper_registry.register(Gauge(
+    'foroum_scraper_browser_pool_events', 'Browser pool counters (launches, recycles, crashes, pages)', ('event',)))
+
+# Web app metrics
+http_requests = web_registry.register(Counter(
+    'foroum_web_requests_total', 'HTTP requests served, by endpoint and status', ('endpoint', 'status')))
+
+
+def count_failed_topics(site_key, failed):
+    """Add the failure count of a parsed page (forums.extractor.ParsedPage.failed)"""
+    if failed:
+        topics.inc(failed, site=site_key, outcome='failed')
+
+
+def count_topics(site_key, counts):
+    """Add the inserted/updated/unchanged counts returned by a save"""
+    for outcome, amount in counts.items():
+        topics.inc(amount, site=site_key, outcome=outcome)
+
+
+def read_scraper_metrics():
+    """The scraper's last metrics dump, or '' when the scraper has not written one"""
+    try:
+        with open(SCRAPER_METRICS_FILE, encoding='utf-8') as f:
+            return f.read()
+    except FileNotFoundError:
+        return ''
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = None
+
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = self.registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Prometheus scrapes every few seconds; keep them out of the logs
+        pass
+
+
+def start_http_server(registry, port, host='127.0.0.1'):
+    """Serve a registry on http://host:port/metrics from a daemon thread"""
+    handler = type('MetricsHandler', (_MetricsHandler,), {'registry': registry})
+    server = ThreadingHTTPServer((host, port), handler)
+    thread = threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True)
+    thread.start()
+    return server
@@ -1,13 +1,110 @@
-from flask import render_template
-from sstrings import nothing_title, nothing_description, main_title, main_description,about_title, about_description
+from flask import Response, render_template, request
+from datetime import datetime, timezone
+from sutils import epoch_to_iso, epoch_to_label
+from sites import site_favicons
+from sstrings import nothing_title, nothing_description, main_title, main_description,about_title, about_description, search_title
+import gzip
+import hashlib
+import threading
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, pages are then only precompressed with gzip
+    brotli = None
 
 _app = None
 
+# Rendered pages, keyed by page name. Each entry is only valid for the data
+# version it was rendered from; a new homepage snapshot simply misses the cache.
+_page_cache = {}
+_page_cache_lock = threading.Lock()
+
+# How long browsers and CDNs may reuse a page without revalidating. The homepage
+# HTML no longer embeds relative times, so it is stable for a whole scrape cycle.
+HOME_MAX_AGE = 30
+STATIC_MAX_AGE = 3600
+
+# /about and the 404 page only change on deploy
+_started_at = datetime.now(timezone.utc).replace(microsecond=0)
+
 def init_app(app):
     global _app
     _app = app
+    app.jinja_env.filters['iso_time'] = epoch_to_iso
+    app.jinja_env.filters['time_label'] = epoch_to_label
+    app.jinja_env.globals['favicons'] = site_favicons()
+    app.jinja_env.globals['search_title'] = search_title
+
+class RenderedPage:
+    """
+    A rendered HTML page with its validators and its compressed variants,
+    computed once per data version.
+    """
+
+    def __init__(self, version, html, last_modified):
+        self.version = version
+        self.body = html.encode('utf-8')
+        self.etag = hashlib.sha1(self.body).hexdigest()
+        self.last_modified = last_modified.replace(microsecond=0)
+        self.variants = {'gzip': gzip.compress(self.body, compresslevel=6)}
+        if brotli is not None:
+            self.variants['br'] = brotli.compress(self.body, quality=9)
+
+def _cached_page(page, version, last_modified, render):
+    """Return the cached RenderedPage for (page, version), rendering it on a miss"""
+    with _page_cache_lock:
+        entry = _page_cache.get(page)
+    if entry is not None and entry.version == version:
+        return entry
+
+    # Render outside the lock; two threads racing on a miss just both render
+    entry = RenderedPage(version, render(), last_modified)
+    with _page_cache_lock:
+        _page_cache[page] = entry
+    return entry
+
+def _respond(entry, status=200, max_age=0):
+    """
+    Build the response for a cached page, picking the best precompressed variant
+    and answering conditional GETs with 304 Not Modified.
+    """
+    encoding = request.accept_encodings.best_match(list(entry.variants) + ['identity'])
+    if encoding not in entry.variants:
+        encoding = None
+    # Strong validators must differ between encodings of the same page
+    etag = f"{entry.etag}-{encoding}" if encoding else entry.etag
+
+    headers = {
+        'ETag': f'"{etag}"',
+        'Last-Modified': entry.last_modified.strftime('%a, %d %b %Y %H:%M:%S GMT'),
+        'Vary': 'Accept-Encoding',
+        'Cache-Control': f'public, max-age={max_age}'
+    }
+
+    if status == 200:
+        if request.if_none_match:
+            not_modified = request.if_none_match.contains(etag)
+        elif request.if_modified_since:
+            not_modified = entry.last_modified <= request.if_modified_since
+        else:
+            not_modified = False
+        if not_modified:
+            return Response(status=304, headers=headers)
+
+    if encoding:
+        headers['Content-Encoding'] = encoding
+    return Response(entry.variants.get(encoding, entry.body), status=status,
+                    headers=headers, mimetype='text/html')
+
+def _aware(moment):
+    """SQLite hands datetimes back naive; they are stored in UTC"""
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
 
 def render_404():
+    entry = _cached_page('404', None, _started_at, _render_404)
+    return _respond(entry, status=404, max_age=STATIC_MAX_AGE)
+
+def _render_404():
     with _app.app_context():
         notfound_render = render_template('404.html')
         return render_template('index.html', 
@@ -15,6 +112,14 @@ def render_404():
                              title=nothing_title, 
                              description=nothing_description)
 
+def render_home(version, created_at, load_topics):
+    """
+    Render the homepage for a snapshot version. `load_topics` is only called when
+    the page for that version is not cached yet.
+    """
+    entry = _cached_page('home', version, _aware(created_at), lambda: render_topic(load_topics()))
+    return _respond(entry, max_age=HOME_MAX_AGE)
+
 def render_topic(topics):
     with _app.app_context():
         topics_render = render_template('topics_list.html', topics=topics)
@@ -22,11 +127,26 @@ def render_topic(topics):
                                content=topics_render, 
                                title=main_title, 
                                description=main_description)
-    
+
+def render_search(query, topics):
+    """Search results are rendered per request; only browsers may keep them briefly"""
+    with _app.app_context():
+        topics_render = render_template('search.html', query=query, topics=topics)
+        html = render_template('index.html',
+                               content=topics_render,
+                               query=query,
+                               title=f"{query} - {search_title}" if query else search_title,
+                               description=main_description)
+    return Response(html, mimetype='text/html', headers={'Cache-Control': f'private, max-age={HOME_MAX_AGE}'})
+
 def render_about():
+    entry = _cached_page('about', None, _started_at, _render_about)
+    return _respond(entry, max_age=STATIC_MAX_AGE)
+
+def _render_about():
     with _app.app_context():
         about_render = render_template('about.html')
         return render_template('index.html', 
                                content=about_render, 
                                title=about_title, 
-                               description=about_description)
\ No newline at end of file
+                               description=about_description)
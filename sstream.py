@@ -0,0 +1,157 @@
+from db_manager import changes_since, latest_change_id
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# How often the broker looks for new changes, and how often idle streams get a keepalive
+POLL_INTERVAL = 2.0
+KEEPALIVE_INTERVAL = 15.0
+
+# Pending batches per client; a client that falls further behind is disconnected
+CLIENT_QUEUE_SIZE = 50
+
+# Concurrent streams per web process. Each one holds a server thread for as long as
+# it is connected (run.sh: 32 gthread threads), so the cap must leave threads free
+# for the pages. Clients above it get a 503 and retry after BUSY_RETRY seconds.
+MAX_STREAMS = int(os.environ.get('FOROUM_MAX_STREAMS', 24))
+BUSY_RETRY = 30
+
+_broker = None
+_slots = None
+
+def init_app(app):
+    global _broker, _slots
+    _broker = ChangeBroker(app)
+    _slots = threading.BoundedSemaphore(MAX_STREAMS)
+
+def acquire_slot():
+    """Reserve a stream slot without waiting; False when all MAX_STREAMS are taken"""
+    return _slots.acquire(blocking=False)
+
+def release_slot():
+    _slots.release()
+
+class ChangeBroker:
+    """
+    Fans the scraper's change log out to every connected /stream client.
+    A single background thread polls the database, so the number of
+    clients does not change the database load.
+    """
+
+    def __init__(self, app, poll_interval=POLL_INTERVAL):
+        self.app = app
+        self.poll_interval = poll_interval
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._last_id = 0
+
+    def subscribe(self):
+        subscriber = queue.Queue(maxsize=CLIENT_QUEUE_SIZE)
+        with self._lock:
+            if not self._subscribers:
+                # Nobody followed the log while idle: start from its end, not from
+                # where the last client left, which may be stale or already pruned
+                with self.app.app_context():
+                    self._last_id = latest_change_id()
+            self._subscribers.add(subscriber)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='change-broker', daemon=True)
+                self._thread.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def is_subscribed(self, subscriber):
+        with self._lock:
+            return subscriber in self._subscribers
+
+    def catch_up(self, last_id):
+        """Changes a reconnecting client missed, read directly from the log"""
+        with self.app.app_context():
+            return [_change_dict(row) for row in changes_since(last_id)]
+
+    def _run(self):
+        while True:
+            time.sleep(self.poll_interval)
+            with self._lock:
+                if not self._subscribers:
+                    continue
+                last_id = self._last_id
+            try:
+                with self.app.app_context():
+                    rows = changes_since(last_id)
+            except Exception as e:
+                logger.error("Failed to poll topic changes: %s", e)
+                continue
+            if not rows:
+                continue
+
+            batch = [_change_dict(row) for row in rows]
+            with self._lock:
+                if self._last_id != last_id:
+                    # Reseeded by a first subscriber during the poll; this batch is stale
+                    continue
+                self._last_id = rows[-1].id
+                subscribers = list(self._subscribers)
+            for subscriber in subscribers:
+                try:
+                    subscriber.put_nowait(batch)
+                except queue.Full:
+                    # Too slow to keep up: drop it, the browser's EventSource reconnects
+                    self.unsubscribe(subscriber)
+
+def _change_dict(row):
+    return {
+        'id': row.id,
+        'kind': row.kind,
+        'site_key': row.site_key,
+        'title': row.title,
+        'topic_url': row.topic_url,
+        'username': row.username,
+        'replies': row.replies,
+        'last_activity': row.last_activity
+    }
+
+def _event(changes):
+    return f"id: {changes[-1]['id']}\nevent: topics\ndata: {json.dumps(changes)}\n\n"
+
+def stream(last_event_id=None):
+    """
+    Generator of Server-Sent Events for one client. Each 'topics' event carries the
+    list of changed topics; its id lets the browser resume with Last-Event-ID.
+    """
+    subscriber = _broker.subscribe()
+    try:
+        sent_id = 0
+        if last_event_id is not None:
+            missed = _broker.catch_up(last_event_id)
+            if missed:
+                sent_id = missed[-1]['id']
+                yield _event(missed)
+        # Reconnection delay for the browser's EventSource, in milliseconds
+        yield "retry: 5000\n\n"
+
+        while True:
+            try:
+                batch = subscriber.get(timeout=KEEPALIVE_INTERVAL)
+            except queue.Empty:
+                if not _broker.is_subscribed(subscriber):
+                    # Dropped for falling behind; closing makes the browser resume with Last-Event-ID
+                    return
+                yield ": keepalive\n\n"
+                continue
+            # Skip what the catch-up already delivered
+            batch = [change for change in batch if change['id'] > sent_id]
+            if batch:
+                sent_id = batch[-1]['id']
+                yield _event(batch)
+    finally:
+        _broker.unsubscribe(subscriber)
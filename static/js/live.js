@@ -0,0 +1,93 @@
+// Applies the /stream live feed to the homepage topic list: updated topics are
+// refreshed in place, and new or updated topics move to the top of the table.
+(function () {
+    var MAX_ROWS = 60;
+    // A 503 (server at its stream limit) closes an EventSource for good; retry
+    // later ourselves, spread out so turned-away clients do not return all at once
+    var BUSY_RETRY_MS = 30000;
+
+    function findRow(tbody, url) {
+        var rows = tbody.querySelectorAll('tr[data-url]');
+        for (var i = 0; i < rows.length; i++) {
+            if (rows[i].getAttribute('data-url') === url) {
+                return rows[i];
+            }
+        }
+        return null;
+    }
+
+    function buildRow(tbody, topic) {
+        var row = document.createElement('tr');
+        row.setAttribute('data-url', topic.topic_url);
+        row.setAttribute('data-site', topic.site_key);
+
+        var subject = document.createElement('td');
+        // Reuse the favicon of another topic from the same forum
+        var sibling = tbody.querySelector('tr[data-site="' + topic.site_key + '"] td:first-child > :first-child');
+        if (sibling) {
+            subject.appendChild(sibling.cloneNode(true));
+        }
+        var link = document.createElement('a');
+        link.className = 'topic-link';
+        link.href = topic.topic_url;
+        link.target = '_blank';
+        subject.appendChild(document.createTextNode(' '));
+        subject.appendChild(link);
+
+        var username = document.createElement('td');
+        username.className = 'topic-username';
+
+        var activity = document.createElement('td');
+        activity.appendChild(document.createElement('time'));
+
+        row.appendChild(subject);
+        row.appendChild(username);
+        row.appendChild(activity);
+        return row;
+    }
+
+    function applyChange(tbody, topic) {
+        var row = findRow(tbody, topic.topic_url) || buildRow(tbody, topic);
+        row.querySelector('.topic-link').textContent = topic.title + ' (' + topic.replies + ')';
+        row.querySelector('.topic-username').textContent = topic.username || '';
+        var stamp = row.querySelector('time');
+        stamp.setAttribute('data-epoch', topic.last_activity === null ? '' : topic.last_activity);
+        stamp.removeAttribute('title');
+        if (topic.last_activity > 0) {
+            stamp.setAttribute('datetime', new Date(topic.last_activity * 1000).toISOString());
+        }
+        tbody.insertBefore(row, tbody.firstChild);
+        if (window.foroumRelativeTime) {
+            window.foroumRelativeTime.refresh(row);
+        }
+    }
+
+    document.addEventListener('DOMContentLoaded', function () {
+        var table = document.getElementById('topics-table');
+        if (!table || !window.EventSource) {
+            return;
+        }
+        var tbody = table.querySelector('tbody');
+
+        function connect() {
+            var source = new EventSource('/stream');
+            source.addEventListener('topics', function (event) {
+                var changes = JSON.parse(event.data);
+                for (var i = 0; i < changes.length; i++) {
+                    applyChange(tbody, changes[i]);
+                }
+                var rows = tbody.querySelectorAll('tr');
+                for (var j = MAX_ROWS; j < rows.length; j++) {
+                    tbody.removeChild(rows[j]);
+                }
+            });
+            source.addEventListener('error', function () {
+                // Plain disconnects reconnect by themselves; only a refused stream is closed
+                if (source.readyState === EventSource.CLOSED) {
+                    setTimeout(connect, BUSY_RETRY_MS * (1 + Math.random()));
+                }
+            });
+        }
+        connect();
+    });
+})();
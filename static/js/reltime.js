@@ -0,0 +1,40 @@
+// Turns the absolute <time data-epoch> stamps of the topic list into French
+// relative labels ("43s", "5min", "2h", "3j"), so the server can send the
+// same cached HTML for a whole scrape cycle.
+(function () {
+    function relativeLabel(epoch) {
+        var seconds = Math.max(0, Math.floor(Date.now() / 1000) - epoch);
+        if (seconds < 60) {
+            return seconds + 's';
+        }
+        if (seconds < 3600) {
+            return Math.floor(seconds / 60) + 'min';
+        }
+        if (seconds < 86400) {
+            return Math.floor(seconds / 3600) + 'h';
+        }
+        return Math.floor(seconds / 86400) + 'j';
+    }
+
+    function refresh(root) {
+        var stamps = (root || document).querySelectorAll('time[data-epoch]');
+        for (var i = 0; i < stamps.length; i++) {
+            var epoch = parseInt(stamps[i].getAttribute('data-epoch'), 10);
+            if (isNaN(epoch) || epoch <= 0) {
+                stamps[i].textContent = 'Inconnu';
+                continue;
+            }
+            stamps[i].textContent = relativeLabel(epoch);
+            if (!stamps[i].title) {
+                stamps[i].title = new Date(epoch * 1000).toLocaleString('fr-FR');
+            }
+        }
+    }
+
+    window.foroumRelativeTime = { refresh: refresh };
+
+    document.addEventListener('DOMContentLoaded', function () {
+        refresh();
+        setInterval(refresh, 15000);
+    });
+})();
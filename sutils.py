@@ -1,4 +1,107 @@
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+import logging
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+# Log level of the scraper and the web app: FOROUM_LOG_LEVEL=DEBUG shows every page
+# fetched and every row skipped, WARNING only what went wrong
+LOG_LEVEL = os.environ.get('FOROUM_LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = '%(asctime)s %(levelname)s %(name)s [%(threadName)s] %(message)s'
+
+def setup_logging(level=None):
+    """Configure the root logger once per process, at FOROUM_LOG_LEVEL unless given a level"""
+    logging.basicConfig(level=level or LOG_LEVEL, format=LOG_FORMAT)
+
+# Timezone of the forums we scrape: their local times are Paris times
+PARIS = ZoneInfo("Europe/Paris")
+
+# Raw timestamp formats seen on the forums, tried in this order
+_ISO_UTC = re.compile(r"(\d{4})-(\d{2})-(\d{2})T(\d{2}):(\d{2}):(\d{2})(?:\.\d+)?Z")    # 2025-04-16T14:20:07.505Z
+_DATE_MDY = re.compile(r"(\d{1,2})/(\d{1,2})/(\d{4})")                                    # 4/15/2025
+_DAY_MONTH_TIME = re.compile(r"(\d{1,2})/(\d{1,2})\s+(\d{1,2}):(\d{2}):(\d{2})")           # 17/04 11:20:22
+_TIME_12H = re.compile(r"(\d{1,2}):(\d{2}):(\d{2})\s*([AP]M)")                              # 5:44:28 PM
+_TIME_24H = re.compile(r"(\d{1,2}):(\d{2}):(\d{2})")                                       # 16:35:58
+_RELATIVE = re.compile(r"(\d+)\s*([smhj])", re.IGNORECASE)                                   # 43s, 5 m, 2j
+
+_RELATIVE_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'j': 86400}
+
+class TimestampNormalizer:
+    """
+    Converts raw forum timestamps to Unix epochs for one batch of rows.
+    "now" is taken once per batch, formats are matched with precompiled regexes
+    instead of trying strptime formats one by one, and local forum times are read
+    as Europe/Paris times whatever the server timezone is. Failures return -1 and
+    are counted in `failures` instead of being printed one by one.
+    """
+
+    def __init__(self, now=None):
+        self.now = (now or datetime.now(timezone.utc)).astimezone(PARIS)
+        self.now_epoch = int(self.now.timestamp())
+        self.failures = 0
+
+    def _paris(self, year, month, day, hour=0, minute=0, second=0):
+        return int(datetime(year, month, day, hour, minute, second, tzinfo=PARIS).timestamp())
+
+    def absolute(self, raw):
+        """Epoch of an absolute timestamp (the formats of convert_to_epoch), -1 on failure"""
+        try:
+            raw = raw.strip()
+            match = _ISO_UTC.fullmatch(raw)
+            if match:
+                return int(datetime(*map(int, match.groups()), tzinfo=timezone.utc).timestamp())
+
+            match = _DATE_MDY.fullmatch(raw)
+            if match:
+                month, day, year = map(int, match.groups())
+                return self._paris(year, month, day)
+
+            match = _DAY_MONTH_TIME.fullmatch(raw)
+            if match:
+                day, month, hour, minute, second = map(int, match.groups())
+                epoch = self._paris(self.now.year, month, day, hour, minute, second)
+                if epoch > self.now_epoch:
+                    # A day/month in the future belongs to last year
+                    epoch = self._paris(self.now.year - 1, month, day, hour, minute, second)
+                return epoch
+
+            match = _TIME_12H.fullmatch(raw)
+            if match:
+                hour, minute, second = int(match.group(1)) % 12, int(match.group(2)), int(match.group(3))
+                if match.group(4) == 'PM':
+                    hour += 12
+                return self._today(hour, minute, second)
+
+            match = _TIME_24H.fullmatch(raw)
+            if match:
+                return self._today(*map(int, match.groups()))
+        except (AttributeError, ValueError, OverflowError):
+            pass
+        self.failures += 1
+        return -1
+
+    def _today(self, hour, minute, second):
+        epoch = self._paris(self.now.year, self.now.month, self.now.day, hour, minute, second)
+        # A time later than now was yesterday's
+        return epoch - 86400 if epoch > self.now_epoch else epoch
+
+    def relative(self, raw):
+        """Epoch of a relative timestamp such as "43s", "5m", "2h" or "2j", -1 on failure"""
+        match = _RELATIVE.fullmatch(raw.strip()) if isinstance(raw, str) else None
+        if not match:
+            self.failures += 1
+            return -1
+        return self.now_epoch - int(match.group(1)) * _RELATIVE_UNITS[match.group(2).lower()]
+
+    def batch(self, raws, kind):
+        """
+        Convert a list of raw timestamps of one kind ('absolute' or 'relative').
+        None entries stay None.
+        """
+        convert = self.absolute if kind == 'absolute' else self.relative
+        return [convert(raw) if raw is not None else None for raw in raws]
 
 def convert_to_epoch(last_activity_raw):
     """
@@ -28,7 +131,7 @@ def convert_to_epoch(last_activity_raw):
                     last_activity_datetime = datetime.strptime(cleaned_date, "%d/%m %H:%M:%S")
                     last_activity_datetime = last_activity_datetime.replace(year=now.year)
                 except ValueError as e:
-                    print(f"[DEBUG] Error parsing date/time: {e}")
+                    logger.debug("Error parsing date/time: %s", e)
                     raise
         elif len(last_activity_raw.split(":")) == 3:
             if "AM" in last_activity_raw or "PM" in last_activity_raw:
@@ -52,7 +155,7 @@ def convert_to_epoch(last_activity_raw):
         return int(last_activity_datetime.timestamp())
 
     except ValueError as e:
-        print(f"[DEBUG] Error in convert_to_epoch: {e} for input: {last_activity_raw}")
+        logger.debug("Error in convert_to_epoch: %s for input: %s", e, last_activity_raw)
         return -1
 
 def epoch_to_relative_time(epoch_timestamp):
@@ -90,9 +193,34 @@ def epoch_to_relative_time(epoch_timestamp):
         else:
             return f"{delta.seconds}s"
     except (ValueError, TypeError, OSError) as e:
-        print(f"[DEBUG] Error in epoch_to_relative_time: {e} for input: {epoch_timestamp}")
+        logger.debug("Error in epoch_to_relative_time: %s for input: %s", e, epoch_timestamp)
         return "Unknown"
 
+def epoch_to_iso(epoch_timestamp):
+    """
+    Convert a Unix epoch timestamp to an ISO 8601 UTC string, for <time datetime>.
+    Returns an empty string if the timestamp is missing or invalid.
+    """
+    try:
+        if epoch_timestamp is None or int(epoch_timestamp) <= 0:
+            return ""
+        return datetime.fromtimestamp(int(epoch_timestamp), timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    except (ValueError, TypeError, OSError, OverflowError):
+        return ""
+
+def epoch_to_label(epoch_timestamp):
+    """
+    Convert a Unix epoch timestamp to a short absolute Paris time (e.g. "17/04 14:05"),
+    shown until the client-side script replaces it with a relative time.
+    Returns "Inconnu" if the timestamp is missing or invalid.
+    """
+    try:
+        if epoch_timestamp is None or int(epoch_timestamp) <= 0:
+            return "Inconnu"
+        return datetime.fromtimestamp(int(epoch_timestamp), PARIS).strftime("%d/%m %H:%M")
+    except (ValueError, TypeError, OSError, OverflowError):
+        return "Inconnu"
+
 def relative_time_to_epoch(relative_time):
     """
     Convert a relative time format (e.g., "43s", "5m", "2h", "2d") to Unix epoch timestamp.
@@ -135,7 +263,7 @@ def relative_time_to_epoch(relative_time):
         return int(target_datetime.timestamp())
 
     except (ValueError, TypeError, IndexError) as e:
-        print(f"[DEBUG] Error in relative_time_to_epoch: {e} for input: {relative_time}")
+        logger.debug("Error in relative_time_to_epoch: %s for input: %s", e, relative_time)
         return -1
 
 
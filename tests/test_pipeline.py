@@ -0,0 +1,109 @@
+"""
+The asyncio fetch pipeline end to end, against a local HTTP server: pages are
+fetched, parsed in the spawned process pool and saved to a throwaway SQLite file.
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from flask import Flask
+
+import db_manager
+from db_manager import SQLiteStorage, db
+from markup import render_page, synthetic_topics
+from pipeline import FetchPipeline
+from sites import SITES_TO_SCRAPE
+import smetrics
+
+
+class PageHandler(BaseHTTPRequestHandler):
+    pages = {}
+
+    def do_GET(self):
+        if self.path.startswith('/slow/'):
+            time.sleep(2)
+        body = self.pages.get(self.path, '').encode('utf-8')
+        self.send_response(200 if body else 404)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), PageHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{httpd.server_address[1]}'
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    storage = SQLiteStorage(str(tmp_path / 'scraped_data.db'))
+    monkeypatch.setattr(db_manager, 'storage', storage)
+    storage.prepare()
+    app = Flask(__name__)
+    storage.init_app(app)
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+@pytest.fixture
+def pipeline(app):
+    pipeline = FetchPipeline(app, fetch_workers=2, parse_workers=1)
+    pipeline.start()
+    yield pipeline
+    pipeline.close()
+
+
+def failed_topics(site_key):
+    for _, labels, value in smetrics.topics.samples():
+        if labels == (('site', site_key), ('outcome', 'failed')):
+            return value
+    return 0
+
+
+def test_failed_topics_are_counted_in_the_parent_process(server, pipeline):
+    html_content = render_page('onche', synthetic_topics(20))
+    # One row whose reply count cannot be read (dropped), one unreadable date (kept)
+    html_content = html_content.replace('<span class="topic-nb">', '<span class="topic-nb">x', 1)
+    last = html_content.rindex('<a class="right"')
+    date = html_content.index('<span>', last) + len('<span>')
+    html_content = html_content[:date] + 'soon' + html_content[date:]
+    PageHandler.pages['/onche/1'] = html_content
+
+    before = failed_topics('onche')
+    result = pipeline.submit('onche', SITES_TO_SCRAPE['onche'], f'{server}/onche/1').result(timeout=60)
+
+    assert result.status == 'ok'
+    assert len(result.topics) == 19
+    assert result.counts['inserted'] == 19
+    assert failed_topics('onche') - before == 2
+
+
+def test_close_fails_pending_pages(server, app):
+    pipeline = FetchPipeline(app, fetch_workers=1, parse_workers=1, queue_size=2)
+    pipeline.start()
+    site_config = dict(SITES_TO_SCRAPE['onche'], min_interval=0)
+    # One page held by the only fetch worker, the others waiting in the queues
+    futures = [pipeline.submit('onche', site_config, f'{server}/slow/{page}') for page in range(6)]
+    time.sleep(0.5)
+    pipeline.close()
+
+    assert [future.result(timeout=5).status for future in futures] == ['failed'] * 6
+    assert pipeline.submit('onche', site_config, f'{server}/onche/1').result(timeout=1).status == 'failed'
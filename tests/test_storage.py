@@ -0,0 +1,217 @@
+"""
+The storage operations of db_manager, run against every backend: a throwaway
+SQLite file, and PostgreSQL when FOROUM_DATABASE_URL is set. The PostgreSQL run
+empties the topic tables first, so point it at a throwaway database:
+
+    FOROUM_DATABASE_URL=postgresql+psycopg://postgres@localhost/foroum_test python -m pytest tests
+"""
+from datetime import datetime, timedelta, timezone
+import base64
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy import insert, select, text
+
+import db_manager
+from db_manager import (
+    DATABASE_URL, HISTORY_RETENTION, SQLiteStorage, TopicHistory, changes_since, compact_history,
+    db, latest_change_id, publish_snapshot, query_topics, read_snapshot, search_topics,
+    snapshot_version, upsert_topics
+)
+
+BACKENDS = (
+    pytest.param('sqlite'),
+    pytest.param('postgresql', marks=pytest.mark.skipif(not DATABASE_URL, reason='FOROUM_DATABASE_URL is not set')),
+)
+
+
+@pytest.fixture(params=BACKENDS)
+def app(request, tmp_path, monkeypatch):
+    """An app context on a fresh, empty database of the backend under test"""
+    if request.param == 'sqlite':
+        storage = SQLiteStorage(str(tmp_path / 'scraped_data.db'))
+    else:
+        from db_postgres import PostgresStorage
+        storage = PostgresStorage(DATABASE_URL)
+    monkeypatch.setattr(db_manager, 'storage', storage)
+
+    storage.prepare()
+    app = Flask(__name__)
+    storage.init_app(app)
+    with app.app_context():
+        if request.param == 'postgresql':
+            db.session.execute(text('TRUNCATE topic, topic_change, topic_history, homepage_snapshot RESTART IDENTITY'))
+            db.session.commit()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+def make_topic(number, **fields):
+    topic = {
+        'title': f'Topic {number}',
+        'topic_url': f'https://forum.invalid/topic/{number}',
+        'username': f'user{number}',
+        'replies': number,
+        'last_activity': 1_700_000_000 + number
+    }
+    topic.update(fields)
+    return topic
+
+
+def test_upsert_topics_counts(app):
+    topics = [make_topic(number) for number in range(1, 4)]
+    assert upsert_topics('onche', topics) == {'inserted': 3, 'updated': 0, 'unchanged': 0}
+    assert upsert_topics('onche', topics) == {'inserted': 0, 'updated': 0, 'unchanged': 3}
+
+    topics[0] = make_topic(1, replies=10)
+    topics[1] = make_topic(2, title='Renamed topic')
+    # The same URL twice in a batch: the last occurrence wins
+    topics.append(make_topic(4))
+    topics.append(make_topic(4, replies=40))
+    assert upsert_topics('onche', topics) == {'inserted': 1, 'updated': 2, 'unchanged': 1}
+
+    rows, _ = query_topics(sort='replies', order='desc', limit=10)
+    assert [(row.title, row.replies) for row in rows] == [
+        ('Topic 4', 40), ('Topic 1', 10), ('Topic 3', 3), ('Renamed topic', 2)
+    ]
+
+
+def test_snapshot_roundtrip(app):
+    assert snapshot_version() is None
+    assert read_snapshot() is None
+
+    upsert_topics('onche', [make_topic(number) for number in range(1, 4)])
+    upsert_topics('avenoel', [make_topic(number) for number in range(4, 6)])
+    assert publish_snapshot() == 1
+
+    version, created_at, topics = read_snapshot()
+    assert version == 1
+    assert snapshot_version() == (1, created_at)
+    assert [topic['topic_url'] for topic in topics] == [make_topic(number)['topic_url'] for number in range(5, 0, -1)]
+    assert topics[0]['site_key'] == 'avenoel'
+    assert datetime.fromisoformat(topics[0]['timestamp'])
+
+    upsert_topics('onche', [make_topic(6)])
+    assert publish_snapshot() == 2
+    version, _, topics = read_snapshot()
+    assert version == 2
+    assert len(topics) == 6
+    assert read_snapshot(decode=False) == (2, read_snapshot()[1], json.dumps(topics))
+
+
+def test_query_topics_cursor_paging(app):
+    topics = [make_topic(number) for number in range(1, 8)]
+    # Topics without a last_activity still come out, after the others
+    topics[2]['last_activity'] = None
+    topics[5]['last_activity'] = None
+    upsert_topics('onche', topics[:5])
+    upsert_topics('avenoel', topics[5:])
+
+    def all_pages(**filters):
+        seen, cursor = [], None
+        while True:
+            rows, cursor = query_topics(limit=2, cursor=cursor, **filters)
+            seen += [row.replies for row in rows]
+            if cursor is None:
+                return seen
+
+    assert all_pages(order='desc') == [7, 5, 4, 2, 1, 6, 3]
+    assert all_pages(order='asc') == [1, 2, 4, 5, 7, 3, 6]
+    assert all_pages(sort='replies', order='desc') == [7, 6, 5, 4, 3, 2, 1]
+    assert all_pages(site_key='avenoel') == [7, 6]
+    assert all_pages(since=1_700_000_004) == [7, 5, 4]
+    assert all_pages(min_replies=5, sort='replies', order='asc') == [5, 6, 7]
+
+    with pytest.raises(ValueError):
+        query_topics(cursor='not a cursor')
+
+
+@pytest.mark.parametrize('sort, payload', [
+    ('last_activity', [[1], 5]),
+    ('last_activity', [{'a': 1}, 5]),
+    ('last_activity', ['1700000000', 5]),
+    ('replies', [1.5, 5]),
+    ('replies', [True, 5]),
+    ('replies', [3, '5']),
+    ('replies', [3]),
+    ('timestamp', [1700000000, 5]),
+    ('timestamp', ['yesterday', 5]),
+])
+def test_query_topics_rejects_crafted_cursors(app, sort, payload):
+    cursor = base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+    with pytest.raises(ValueError):
+        query_topics(sort=sort, cursor=cursor)
+
+
+def test_search_topics_accents_and_prefixes(app):
+    upsert_topics('onche', [
+        make_topic(1, title='Élection présidentielle française'),
+        make_topic(2, title='Recette du café', username='Zoé'),
+        make_topic(3, title='Match de football')
+    ])
+
+    def titles(query):
+        return sorted(row.title for row in search_topics(query, limit=10))
+
+    assert titles('election') == ['Élection présidentielle française']
+    assert titles('ÉLECTION') == ['Élection présidentielle française']
+    assert titles('fran') == ['Élection présidentielle française']
+    assert titles('presid fran') == ['Élection présidentielle française']
+    assert titles('cafe') == ['Recette du café']
+    assert titles('zoe') == ['Recette du café']
+    assert titles('election football') == []
+    assert titles('nothing') == []
+    assert titles('"*') == []
+
+
+def test_compact_history(app):
+    now = int(datetime.now(timezone.utc).timestamp())
+    # An hour bucket three days ago, fully inside the downsampled range
+    bucket = (now - 3 * 86400) // 3600 * 3600
+    expired = now - int((HISTORY_RETENTION + timedelta(days=1)).total_seconds())
+    points = [
+        (1, expired, 1),
+        (1, bucket, 2), (1, bucket + 600, 3), (1, bucket + 1200, 4),
+        (1, bucket + 3600, 5),
+        (1, now - 60, 6), (1, now - 30, 7),
+        (2, bucket + 100, 1),
+    ]
+    db.session.execute(insert(TopicHistory), [
+        {'topic_id': topic_id, 'cycle_ts': cycle_ts, 'replies': replies} for topic_id, cycle_ts, replies in points
+    ])
+    db.session.commit()
+
+    assert compact_history() == 3
+    remaining = db.session.execute(
+        select(TopicHistory.topic_id, TopicHistory.cycle_ts).order_by(TopicHistory.topic_id, TopicHistory.cycle_ts)
+    ).all()
+    assert [tuple(row) for row in remaining] == [
+        (1, bucket + 1200), (1, bucket + 3600), (1, now - 60), (1, now - 30), (2, bucket + 100)
+    ]
+    assert compact_history() == 0
+
+
+def test_changes_since(app):
+    assert latest_change_id() == 0
+    assert changes_since(0) == []
+
+    upsert_topics('onche', [make_topic(1), make_topic(2)])
+    upsert_topics('onche', [make_topic(1), make_topic(2, replies=20)])
+
+    changes = changes_since(0)
+    assert [(change.kind, change.topic_url, change.replies) for change in changes] == [
+        ('insert', make_topic(1)['topic_url'], 1),
+        ('insert', make_topic(2)['topic_url'], 2),
+        ('update', make_topic(2)['topic_url'], 20)
+    ]
+    assert latest_change_id() == changes[-1].id
+    assert [change.id for change in changes_since(changes[0].id)] == [change.id for change in changes[1:]]
+    assert [change.id for change in changes_since(0, limit=1)] == [changes[0].id]
+    assert changes_since(changes[-1].id) == []
@@ -0,0 +1,61 @@
+"""
+The /stream change broker against a throwaway SQLite file.
+"""
+import os
+import queue
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+
+import db_manager
+from db_manager import SQLiteStorage, db, upsert_topics
+from sstream import ChangeBroker
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    storage = SQLiteStorage(str(tmp_path / 'scraped_data.db'))
+    monkeypatch.setattr(db_manager, 'storage', storage)
+    storage.prepare()
+    app = Flask(__name__)
+    storage.init_app(app)
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+def write_topic(app, number, replies=0):
+    with app.app_context():
+        upsert_topics('onche', [{
+            'title': f'Topic {number}',
+            'topic_url': f'https://forum.invalid/topic/{number}',
+            'username': 'user',
+            'replies': replies,
+            'last_activity': 1_700_000_000 + replies
+        }])
+        db.session.remove()
+
+
+def test_first_subscriber_after_idle_gets_only_new_changes(app):
+    broker = ChangeBroker(app, poll_interval=0.05)
+    write_topic(app, 1)
+
+    subscriber = broker.subscribe()
+    write_topic(app, 2)
+    assert [change['topic_url'] for change in subscriber.get(timeout=5)] == ['https://forum.invalid/topic/2']
+    broker.unsubscribe(subscriber)
+
+    # Changes logged while nobody listens are not replayed to the next client
+    write_topic(app, 1, replies=5)
+    write_topic(app, 3)
+    subscriber = broker.subscribe()
+    write_topic(app, 4)
+    assert [change['topic_url'] for change in subscriber.get(timeout=5)] == ['https://forum.invalid/topic/4']
+    with pytest.raises(queue.Empty):
+        subscriber.get(timeout=0.3)
+    broker.unsubscribe(subscriber)